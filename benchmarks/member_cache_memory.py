@@ -0,0 +1,123 @@
+"""
+Benchmark: memory held for members, MEMBER_MODE=cached vs MEMBER_MODE=lazy.
+
+Builds a synthetic guild, then measures with tracemalloc what holding its members costs:
+- cached: every member is a discord.Member in the discord.py member cache, like after chunking at startup.
+- lazy: the discord.py member cache is off, and the member cache of the DB holds
+  the MEMBER_CACHE_SIZE most recently used members, as rows of the members table.
+
+Needs no Discord connection nor database, only the bot's requirements.
+Run it from the repo root:
+    python benchmarks/member_cache_memory.py --members 100000 --cache-size 10000
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+
+import discord
+from discord.state import ConnectionState
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from db.member_cache import MemberCache, StoredMember  # noqa: E402
+
+GUILD_ID = 200_000_000_000 << 22
+
+
+def member_snowflake(n: int) -> int:
+    return (300_000_000_000 + n * 1_000) << 22
+
+
+def member_data(n: int) -> dict:
+    """
+    A member payload, shaped like the ones received when a guild is chunked.
+    """
+    return {
+        "user": {
+            "id": str(member_snowflake(n)),
+            "username": f"member_{n}",
+            "global_name": f"Member {n}",
+            "discriminator": "0",
+            "avatar": f"{n:032x}",
+        },
+        "nick": f"nick_{n}" if n % 4 == 0 else None,
+        "roles": [],
+        "joined_at": "2023-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def build_guild(state: ConnectionState) -> discord.Guild:
+    return discord.Guild(
+        data={
+            "id": str(GUILD_ID),
+            "name": "benchmark",
+            "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0,
+                       "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+            "member_count": 0,
+            "features": [],
+            "channels": [],
+            "emojis": [],
+            "stickers": [],
+        },
+        state=state,
+    )
+
+
+def measure_cached(members: int) -> int:
+    """
+    :return: int - bytes held by the discord.py member and user caches
+    """
+    state = ConnectionState(dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=None,
+                            intents=discord.Intents.all(), member_cache_flags=discord.MemberCacheFlags.all())
+    guild = build_guild(state)
+
+    tracemalloc.start()
+    for n in range(members):
+        guild._add_member(discord.Member(data=member_data(n), guild=guild, state=state))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def measure_lazy(cache_size: int) -> int:
+    """
+    :return: int - bytes held by the member cache of the DB, once full
+    """
+    cache = MemberCache(db=None, size=cache_size)
+    created_at = datetime.now(timezone.utc)
+
+    tracemalloc.start()
+    for n in range(cache_size):
+        cache.members[(GUILD_ID, member_snowflake(n))] = StoredMember(
+            member_snowflake(n), GUILD_ID, f"member_{n}",
+            f"https://cdn.discordapp.com/avatars/{member_snowflake(n)}/{n:032x}.png?size=1024",
+            f"nick_{n}" if n % 4 == 0 else None, f"Member {n}", "@everyone", created_at, created_at,
+        )
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=100_000, help="Members in the synthetic guild")
+    parser.add_argument("--cache-size", type=int, default=10_000, help="MEMBER_CACHE_SIZE of the lazy mode")
+    args = parser.parse_args()
+
+    cached = measure_cached(args.members)
+    lazy = measure_lazy(min(args.cache_size, args.members))
+
+    print(f"Synthetic guild of {args.members:,} members\n")
+    print(f"{'mode':<8}{'members held':>14}{'memory':>12}{'per member':>13}")
+    print(f"{'cached':<8}{args.members:>14,}{cached / 2**20:>10.1f}MB{cached / args.members:>11.0f} B")
+    held = min(args.cache_size, args.members)
+    print(f"{'lazy':<8}{held:>14,}{lazy / 2**20:>10.1f}MB{lazy / max(held, 1):>11.0f} B")
+    print(f"\nlazy mode holds {cached / max(lazy, 1):.1f}x less memory for members.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: discord snowflakes stored as TEXT vs BIGINT.
+
+Builds two synthetic copies of the members table, one per key type,
+then compares the size of the (discord_guild_id, discord_member_id) index
+and the latency of point lookups through it.
+
+Needs a running Postgres, configured with the same POSTGRES_* variables as the bot.
+Run it from the repo root:
+    python benchmarks/snowflake_bigint.py --rows 1000000 --lookups 10000
+"""
+import os
+import random
+import argparse
+import statistics
+from time import perf_counter
+
+import psycopg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GUILDS = 10
+
+
+def conn_string() -> str:
+    return (f"postgresql://"
+            f"{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+            f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}"
+            f"/{os.getenv('POSTGRES_DB')}")
+
+
+def guild_snowflake(n: int) -> int:
+    return (200_000_000_000 + n % GUILDS) << 22
+
+
+def member_snowflake(n: int) -> int:
+    return (300_000_000_000 + n * 1_000) << 22
+
+
+def build_table(connection, key_type: str, rows: int) -> str:
+    """
+    Creates and fills a members-shaped table keyed by key_type.
+
+    :return: str - the name of the table
+    """
+    table = f"bench_members_{key_type.lower()}"
+    connection.execute(f"DROP TABLE IF EXISTS {table}")
+    connection.execute(f"""
+        CREATE UNLOGGED TABLE {table} (
+            id SERIAL PRIMARY KEY,
+            discord_guild_id {key_type},
+            discord_member_id {key_type},
+            name TEXT
+        )""")
+    connection.execute(f"""
+        INSERT INTO {table} (discord_guild_id, discord_member_id, name)
+        SELECT
+            ((200000000000 + n % {GUILDS}) << 22)::{key_type}
+            , ((300000000000 + n * 1000) << 22)::{key_type}
+            , 'member_' || n
+        FROM generate_series(1::BIGINT, {rows}::BIGINT) AS n""")
+    connection.execute(f"CREATE UNIQUE INDEX {table}_key ON {table} (discord_guild_id, discord_member_id)")
+    connection.execute(f"ANALYZE {table}")
+    return table
+
+
+def measure(connection, table: str, key_type: str, rows: int, lookups: int) -> dict:
+    """
+    Measures the index size and the latency of point lookups on a table.
+
+    :return: dict - index size in bytes, and lookup latencies in microseconds
+    """
+    cursor = connection.execute(f"SELECT pg_relation_size('{table}_key')")
+    index_size = cursor.fetchone()[0]
+
+    convert = str if key_type == "TEXT" else int
+    query = f"SELECT name FROM {table} WHERE discord_guild_id = %s AND discord_member_id = %s"
+
+    cursor = connection.execute("EXPLAIN " + query, (convert(guild_snowflake(1)), convert(member_snowflake(1))))
+    plan = cursor.fetchone()[0]
+
+    timings = []
+    for n in random.sample(range(1, rows + 1), lookups):
+        params = (convert(guild_snowflake(n)), convert(member_snowflake(n)))
+        start = perf_counter()
+        connection.execute(query, params).fetchone()
+        timings.append((perf_counter() - start) * 1_000_000)
+
+    timings.sort()
+    return {
+        "index_size": index_size,
+        "median": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "plan": plan,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    results = {}
+    with psycopg.connect(conn_string(), autocommit=True) as connection:
+        for key_type in ("TEXT", "BIGINT"):
+            print(f"Building {args.rows:,} rows keyed by {key_type}...")
+            table = build_table(connection, key_type, args.rows)
+            results[key_type] = measure(connection, table, key_type, args.rows, args.lookups)
+            connection.execute(f"DROP TABLE {table}")
+
+    print()
+    print(f"{'':8}{'index size':>14}{'median lookup':>16}{'p99 lookup':>14}")
+    for key_type, result in results.items():
+        print(f"{key_type:8}{result['index_size'] / 1024 / 1024:>11.1f} MB"
+              f"{result['median']:>13.1f} us{result['p99']:>11.1f} us")
+        print(f"{'':8}plan: {result['plan']}")
+
+    text, bigint = results["TEXT"], results["BIGINT"]
+    print()
+    print(f"BIGINT index is {text['index_size'] / bigint['index_size']:.2f}x smaller, "
+          f"median lookup is {text['median'] / bigint['median']:.2f}x faster.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,115 @@
 import os
+from __startup__ import tracer, HEAVY_MODULES
+from __logger__ import setup_logger
+# Before anything else, so the warnings of the startup itself, timed imports included, are not lost.
+setup_logger(level=int(os.getenv("LOG_LEVEL")), stream_logs=bool(os.getenv("STREAM_LOGS")))
+
+tracer.begin("imports")
+tracer.time_imports(*HEAVY_MODULES)
+
 import sys
+import time
+import asyncio
 import logging
 import discord
 from discord.ext import commands
 
-from __logger__ import setup_logger
+from cogs import discover_cogs
 from db.database import init_db
+from services.audit_log import init_audit_log
+from services.channel_resolver import init_channel_resolver
+from services.health import init_health
+from services.hot_reload import init_hot_reload
+from services.intents import loaded_events, missing_intents, resolve_intents
+from services.log_pipeline import init_log_pipeline
+from services.message_store import init_message_store
+from services.scheduler import init_scheduler
+tracer.end("imports")
+discord.utils.setup_logging()
 
 
 logger = logging.getLogger(__name__)
-setup_logger(level=int(os.getenv("LOG_LEVEL")), stream_logs=bool(os.getenv("STREAM_LOGS")))
 
-intents = discord.Intents.all()
-intents.message_content = True
-bot = commands.Bot(command_prefix=os.getenv("PREFIX"), intents=intents)
 
+class Bot(commands.Bot):
+    async def close(self) -> None:
+        """
+        Unloads the cogs, then sends the logs they queued, before the HTTP session is closed.
+        commands.Bot.close unloads them too, but closes the session straight after.
+        """
+        for extension in tuple(self.extensions):
+            try:
+                await self.unload_extension(extension)
+            except Exception as e:
+                logger.warning(f"- - - Cog failed to unload: {extension}. Error: {e}")
+        if hasattr(self, "log_pipeline"):
+            await self.log_pipeline.drain()
+        await super().close()
 
-async def load_cogs(robot: commands.Bot) -> None:
+
+with tracer.phase("intents"):  # Reads the source of every cog
+    intents, member_cache_flags, chunk_guilds = resolve_intents(discover_cogs())
+# Deleted and edited messages are logged from bot.message_store, the discord.py cache can stay small.
+bot = Bot(command_prefix=os.getenv("PREFIX"), intents=intents, member_cache_flags=member_cache_flags
+          , chunk_guilds_at_startup=chunk_guilds
+          , max_messages=int(os.getenv("MESSAGE_CACHE_SIZE", 1000)) or None)
+
+
+async def load_cog(robot: commands.Bot, extension: str):
+    """
+    Loads one cog.
+
+    :return: float - seconds it took to load, None if it failed to load
     """
-    Loads the directories under the /cogs/ folder,
-    then digs through those directories and loads the cogs.
+    start = time.perf_counter()
+    try:
+        await robot.load_extension(extension)
+    except Exception as e:
+        logger.warning(f"- - - Cog failed to load: {extension}")
+        logger.warning(f"- - - {e}")
+        return None
+    return time.perf_counter() - start
 
-    We do not load files starting with _ and the templates folder.
+
+async def load_cogs(robot: commands.Bot) -> None:
+    """
+    Loads the cogs under the /cogs/ folder, see discover_cogs, one after the other.
+    Loading a cog is mostly importing its module, which blocks the loop: there is nothing to overlap.
+    The slowest cogs are logged first, and recorded in the startup timeline.
     """
     logger.info("Loading Cogs...")
-    for directory in os.listdir("./src/cogs"):
-        if not directory.startswith("_") and directory != "templates":
-            for file in os.listdir(f"./src/cogs/{directory}"):
-                if file.endswith('.py') and not file.startswith("_"):
-                    logger.debug(f"Loading Cog: \\{directory}\\{file}")
-                    try:
-                        await robot.load_extension(f"cogs.{directory}.{file[:-3]}")
-                    except Exception as e:
-                        logger.warning("- - - Cog failed to load!!")
-                        logger.warning(f"- - - {e}")
-    logger.info("... Success.")
-
-
-def connect_to_db(flag_db):
+    start = time.perf_counter()
+    extensions = discover_cogs()
+    timings = [await load_cog(robot, extension) for extension in extensions]
+    for extension, took in sorted(zip(extensions, timings), key=lambda item: item[1] or 0, reverse=True):
+        if took is not None:
+            logger.info(f"- Loaded Cog: {extension} in {took * 1000:.1f}ms")
+            tracer.cogs[extension] = round(took, 4)
+    loaded = sum(took is not None for took in timings)
+    logger.info(f"... Loaded {loaded}/{len(extensions)} cogs in {time.perf_counter() - start:.2f}s.")
+    # The intents were picked from the source of the cogs, the loaded listeners have the last word.
+    missing = missing_intents(robot, loaded_events(robot))
+    if missing:
+        logger.warning(f"The cogs listen to events that need intents the bot does not have: {missing}.")
+
+
+async def connect_to_db(flag_db):
     if flag_db:
         init_db(bot)
         logger.info(f"Healthchecking database...")
-        bot.db.healthcheck()
+        with tracer.phase("db.healthcheck"):
+            if not await bot.db.healthcheck():
+                # Nothing works without the database, open() and migrate() would only fail further down.
+                logger.critical("PostgreSQL is unreachable, check the POSTGRES_* settings. Stopping the bot.")
+                raise RuntimeError("PostgreSQL is unreachable.")
+        with tracer.phase("db.open"):
+            await bot.db.open()
+        with tracer.phase("db.migrate"):
+            await bot.db.migrate()
+        with tracer.phase("db.caches"):
+            await bot.db.settings.load_all()
+            await bot.db.tickets.load_all()
+        bot.db.notifier.start()
 
 
 @bot.event
@@ -49,8 +117,35 @@ async def setup_hook() -> None:
     """
     The setup_hook executes before the bot logs in.
     """
-    connect_to_db(True)
+    tracer.end("login")
+    init_health(bot)
+    await bot.health.start()
+    with tracer.phase("db"):
+        await connect_to_db(True)
+    with tracer.phase("services"):
+        init_audit_log(bot)
+        init_scheduler(bot)
+        init_channel_resolver(bot)
+        init_log_pipeline(bot)
+        init_message_store(bot)
+        init_hot_reload(bot)
+    # Once, before logging in: on_ready fires again on every reconnect.
+    with tracer.phase("cogs"):
+        await load_cogs(bot)
+    bot.health.cogs_loaded = True
+    bot.hot_reload.start()
     logger.debug("Executing set up hook...")
+    tracer.begin("gateway")
+
+
+@bot.listen()
+async def on_connect() -> None:
+    """
+    Connected to the gateway, the guilds are received (and chunked) until on_ready.
+    """
+    tracer.end("gateway")
+    if getattr(bot, "ready_in", None) is None:
+        tracer.begin("guilds")
 
 
 @bot.event
@@ -59,8 +154,32 @@ async def on_ready() -> None:
     The on_ready is executed AFTER the bot logs in.
     """
     logger.debug("Executing on_ready event.")
-    await load_cogs(bot)
-    logger.info(f"{bot.user.name} is online and ready to go.")
+    if getattr(bot, "ready_in", None) is not None:
+        logger.info(f"{bot.user.name} is ready again.")
+        return
+    tracer.end("guilds")
+    bot.ready_in = tracer.elapsed()
+    tracer.report()
+    logger.info(f"{bot.user.name} is online and ready to go, in {bot.ready_in:.2f}s.")
+    budget = float(os.getenv("STARTUP_BUDGET", 30))
+    if budget and bot.ready_in > budget:
+        logger.warning(f"Startup took {bot.ready_in:.2f}s, over the STARTUP_BUDGET of {budget:.0f}s.")
+
+
+async def run_bot(token: str) -> None:
+    """
+    Runs the bot until it is closed, then closes the database pool.
+    The pool is closed last, so cogs can still write while being unloaded.
+    """
+    tracer.begin("login")
+    try:
+        async with bot:
+            await bot.start(token)
+    finally:
+        if hasattr(bot, "health"):
+            await bot.health.stop()
+        if hasattr(bot, "db"):
+            await bot.db.close()
 
 
 def boink() -> None:
@@ -72,11 +191,11 @@ def boink() -> None:
     if len(sys.argv) > 1:  # Check args for the token first
         token = sys.argv[1].replace('TOKEN=', '')
         logger.debug('Loading Token from arg.')
-        bot.run(token)
+        asyncio.run(run_bot(token))
 
     elif os.environ['TOKEN'] is not None:  # if not in args, check the env vars
         logger.debug('Loading Token from environment variable.')
-        bot.run(os.environ['TOKEN'])
+        asyncio.run(run_bot(os.environ['TOKEN']))
 
     else:
         logger.critical('You must include a bot token...')
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import os
+import json
+import time
+import logging
+import importlib
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# The third party modules that make up most of the import time, in import order: discord imports aiohttp.
+HEAVY_MODULES = ("aiohttp", "discord", "discord.ext.commands", "psycopg", "psycopg_pool", "dotenv")
+
+
+class StartupTracer:
+    """
+    Timeline of the startup, from the top of __main__.py to the first on_ready.
+
+    Phases are named spans on the monotonic clock, relative to the start of the tracer:
+    imports, the database setup, the cogs, logging in, connecting to the gateway and receiving the guilds.
+    The timeline is logged once, as a single JSON line, and written to STARTUP_TRACE_FILE when it is set.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.phases: list[dict] = []
+        self.imports: dict[str, float] = {}
+        self.cogs: dict[str, float] = {}
+        self._open: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def begin(self, name: str) -> None:
+        """
+        Starts a phase that ends somewhere else, e.g. in another event.
+        """
+        self._open[name] = self.elapsed()
+
+    def end(self, name: str) -> None:
+        """
+        Ends a phase started with begin. Does nothing if it is not running, e.g. on a reconnect.
+        """
+        if name in self._open:
+            start = self._open.pop(name)
+            self.phases.append({"name": name, "start": round(start, 4), "duration": round(self.elapsed() - start, 4)})
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Times the code in the with block, async code included.
+        """
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def time_imports(self, *modules: str) -> None:
+        """
+        Imports modules one after the other, and records how long each took.
+        A module imported by an earlier one costs nothing, so list them from the most depended on.
+        """
+        for module in modules:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logger.warning(f"Failed to import {module} while timing imports. Error: {e}")
+                continue
+            self.imports[module] = round(time.perf_counter() - start, 4)
+
+    def summary(self) -> dict:
+        return {
+            "total": round(self.elapsed(), 4),
+            "phases": sorted(self.phases, key=lambda phase: phase["start"]),
+            "imports": self.imports,
+            "cogs": dict(sorted(self.cogs.items(), key=lambda item: item[1], reverse=True)),
+        }
+
+    def report(self, path: str | None = None) -> dict:
+        """
+        Logs the timeline, and writes it to a JSON file, STARTUP_TRACE_FILE if no path is given.
+        """
+        path = path or os.getenv("STARTUP_TRACE_FILE")
+        summary = self.summary()
+        logger.info(f"Startup timeline: {json.dumps(summary)}")
+        if path:
+            try:
+                with open(path, "w") as file:
+                    json.dump(summary, file, indent=2)
+            except OSError as e:
+                logger.warning(f"Failed to write the startup timeline to {path}. Error: {e}")
+        return summary
+
+
+# Created when first imported, which is the first thing __main__.py does.
+tracer = StartupTracer()
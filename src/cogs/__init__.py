@@ -0,0 +1,18 @@
+import os
+
+COGS_DIR = os.path.dirname(__file__)
+
+
+def discover_cogs():
+    """
+    Lists the cogs under the /cogs/ folder, as extension names ready for load_extension.
+
+    We do not list files starting with _ and the templates folder.
+    """
+    extensions = []
+    for directory in sorted(os.listdir(COGS_DIR)):
+        if not directory.startswith("_") and os.path.isdir(os.path.join(COGS_DIR, directory)):
+            for file in sorted(os.listdir(os.path.join(COGS_DIR, directory))):
+                if file.endswith('.py') and not file.startswith("_"):
+                    extensions.append(f"cogs.{directory}.{file[:-3]}")
+    return extensions
@@ -1,6 +1,8 @@
 import logging
 from discord.ext import commands
 
+from services.scheduler import INTERACTIVE
+
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +14,7 @@ class Ping(commands.Cog):
     @commands.command()
     async def ping(self, ctx: commands.Context) -> None:
         logger.debug("Ping command used.")
-        await ctx.channel.send("poing")
+        await self.bot.scheduler.send(ctx.channel, "poing", priority=INTERACTIVE)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -10,9 +10,9 @@ class DBsync(commands.Cog):
         self.bot = bot
 
     @commands.command()
-    async def db_sync(self, guilds=True, channels=True, members=True, roles=True, settings=True) -> None:
+    async def db_sync(self, ctx: commands.Context) -> None:
         logger.debug("db_sync command used.")
-        self.bot.db.sync(self, guilds=True, channels=True, members=True, roles=True, settings=True)
+        await self.bot.db.sync(guilds=True, channels=True, members=True, roles=True, settings=True)
 
 
 async def setup(bot: commands.Bot) -> None:
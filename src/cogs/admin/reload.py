@@ -0,0 +1,54 @@
+import logging
+from discord.ext import commands
+
+from services.scheduler import INTERACTIVE
+
+
+logger = logging.getLogger(__name__)
+
+
+async def is_admin(ctx) -> bool:
+    return ctx.message.author.guild_permissions.administrator
+
+
+class CogReload(commands.Cog):
+    """
+    Reloads cogs without restarting the bot, see services.hot_reload.
+    """
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @commands.command(name="reload")
+    @commands.check(is_admin)
+    async def reload(self, ctx, extension: str = None):
+        """
+        Reloads one cog, e.g. logging.log_names or log_names, or every cog whose file changed.
+        """
+        if extension is None:
+            results = await self.bot.hot_reload.reload_changed()
+            if not results:
+                await self.bot.scheduler.send(ctx, 'No cog changed.', priority=INTERACTIVE)
+                return
+        else:
+            matches = [name for name in self.bot.extensions
+                       if name == extension or name.endswith(f'.{extension}')]
+            if len(matches) != 1:
+                await self.bot.scheduler.send(ctx, f'No single loaded cog matches {extension}.', priority=INTERACTIVE)
+                return
+            results = {matches[0]: await self.bot.hot_reload.reload(matches[0])}
+
+        logger.info(f"{ctx.author.name} reloaded: {results}")
+        await self.bot.scheduler.send(ctx, '\n'.join(
+            f'{"Reloaded" if reloaded else "Failed to reload, kept the previous version of"} {name}'
+            for name, reloaded in results.items()
+        ), priority=INTERACTIVE)
+
+    @reload.error
+    async def reload_error(self, ctx, error):
+        if isinstance(error, commands.CheckFailure):
+            await self.bot.scheduler.send(ctx, 'Oie, you cant use that.', priority=INTERACTIVE)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(CogReload(bot))
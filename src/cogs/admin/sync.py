@@ -1,6 +1,8 @@
 import logging
 from discord.ext import commands
 
+from services.scheduler import INTERACTIVE
+
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +24,7 @@ class CommandSync(commands.Cog):
     @sync.error
     async def sync_error(self, ctx, error):
         if isinstance(error, commands.CheckFailure):
-            await ctx.send('Oie, you cant use that.')
+            await self.bot.scheduler.send(ctx, 'Oie, you cant use that.', priority=INTERACTIVE)
 
 
 async def setup(bot: commands.Bot) -> None:
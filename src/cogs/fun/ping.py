@@ -2,6 +2,8 @@ import logging
 import discord
 from discord.ext import commands
 
+from services.scheduler import INTERACTIVE
+
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +15,7 @@ class Ping(commands.Cog):
     @commands.hybrid_command()
     async def ping(self, ctx: commands.Context) -> None:
         logger.debug("Ping command used.")
-        await ctx.channel.send("poing")
+        await self.bot.scheduler.send(ctx.channel, "poing", priority=INTERACTIVE)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -42,13 +42,11 @@ class LogAvatars(commands.Cog):
         """
         if the avatar before is != to the avatar after, do stuff.
         """
-        logger.info(f"{before.name} updated their avatar.")
-
-        # This is from Zorak.
-        # TODO: Replace log channel with entry in the DB.
-        # if before.avatar != after.avatar:
-        #     logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-        #     await logs_channel.send(embed=channel_embed)
+        if before.avatar != after.avatar:
+            logger.info(f"{before.name} updated their avatar.")
+            # Users don't belong to a guild, so every guild we share with them gets the log.
+            for guild in after.mutual_guilds:
+                await self.bot.log_pipeline.send(guild, "moderation_log", channel_embed(before, after))
         return
 
 
@@ -10,7 +10,7 @@ def embed_ban(some_member, audit_log_entry) -> discord.Embed:
     """
     Embedding for user ban alerts.
 
-    :param some_member: discord.Member
+    :param some_member: discord.User, or discord.Member if it was cached
         - The member being banned
     :param audit_log_entry: discord.AuditLogEntry
         - The audit log entry of the event
@@ -33,32 +33,39 @@ def embed_ban(some_member, audit_log_entry) -> discord.Embed:
 
 class LogBans(commands.Cog):
     """
-    Simple listener to on_member_remove
+    Simple listener to on_raw_member_remove
     then checks the audit log for exact details
+
+    The raw event fires for every member, in MEMBER_MODE=lazy too, where members are not cached.
     """
     def __init__(self, bot) -> None:
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member) -> None:
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
         """
         First we don't log bans for unapproved people.
         then we grab the guild, and from there read the last entry in the audit log.
         """
+        guild = self.bot.get_guild(payload.guild_id)
+        member = payload.user
+        if guild is None:
+            return
         # TODO: [verification!] - Update this to pull form DB!
         # if "Needs Approval" in [role.name for role in member.roles]:
         #     return
 
-        audit_log = [entry async for entry in member.guild.audit_logs(limit=1)][0]
+        # Kicks and leaves ask for the same actions, so the three logs share one lookup.
+        audit_log = await self.bot.audit_log.find(
+            guild, discord.AuditLogAction.ban, discord.AuditLogAction.kick, target=member
+        )
 
-        if str(audit_log.action) == "AuditLogAction.ban":
-            if audit_log.target == member:
+        if audit_log is not None and audit_log.action == discord.AuditLogAction.ban:
+            if audit_log.target.id == member.id:
                 embed = embed_ban(member, audit_log)
 
-                logger.info(f"{member.name} was kicked from {member.guild.name} by {audit_log.user.name}")
-                # TODO: Update this to pull form DB!
-                # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-                # await logs_channel.send(embed=embed)
+                logger.info(f"{member.name} was banned from {guild.name} by {audit_log.user.name}")
+                await self.bot.log_pipeline.send(guild, "moderation_log", embed)
                 return
 
 
@@ -11,7 +11,7 @@ def embed_leave(some_member) -> discord.Embed:
     """
     Embedding for user leave alerts.
 
-    :param some_member: discord.Member
+    :param some_member: discord.User, or discord.Member if it was cached
          - The member that left the guild.
     """
     embed = discord.Embed(
@@ -26,32 +26,39 @@ def embed_leave(some_member) -> discord.Embed:
 
 class LogLeaving(commands.Cog):
     """
-    Simple listener to on_member_remove
+    Simple listener to on_raw_member_remove
     then checks the audit log for exact details
+
+    The raw event fires for every member, in MEMBER_MODE=lazy too, where members are not cached.
     """
 
     def __init__(self, bot) -> None:
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member) -> None:
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
         """
         First we don't log leaves for unapproved people.
         then we grab the guild, and from there read the last entry in the audit log.
         """
+        guild = self.bot.get_guild(payload.guild_id)
+        member = payload.user
+        if guild is None:
+            return
         # TODO: [verification!] - Update this to pull form DB!
         # if "Needs Approval" in [role.name for role in member.roles]:
         #     return
 
-        audit_log = [entry async for entry in member.guild.audit_logs(limit=1)][0]
+        # Bans and kicks ask for the same actions, so the three logs share one lookup.
+        audit_log = await self.bot.audit_log.find(
+            guild, discord.AuditLogAction.ban, discord.AuditLogAction.kick, target=member
+        )
 
-        if str(audit_log.action) != "AuditLogAction.ban" and str(audit_log.action) != "AuditLogAction.kick":
+        if audit_log is None:
             embed = embed_leave(member)
 
-            logger.info(f"{member.name} has left {member.guild.name}")
-            # # TODO: Replace log channel with entry in the DB.
-            # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["join_log"])
-            # await logs_channel.send(embed=embed)
+            logger.info(f"{member.name} has left {guild.name}")
+            await self.bot.log_pipeline.send(guild, "join_log", embed)
 
 
 async def setup(bot: commands.Bot) -> None:
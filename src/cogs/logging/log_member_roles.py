@@ -1,3 +1,5 @@
+import os
+import asyncio
 import logging
 import discord
 from discord.ext import commands
@@ -6,95 +8,147 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 
-def embed_role_add(some_member, member_who_did_action, role_obj) -> discord.Embed:
+def embed_role_update(some_member, member_who_did_action, added_roles, removed_roles) -> discord.Embed:
     """
-    Embedding for user kick alerts.
+    Embedding for role updates, every role added and removed in one go.
 
     :param some_member: discord.Member
         - The receiver of the action
     :param member_who_did_action: discord.Member
-        - The person who did the action
-    :param role_obj: discord.Role
-        - The role in question
+        - The person who did the action, None if the audit log does not say
+    :param added_roles: list
+        - The IDs of the roles added
+    :param removed_roles: list
+        - The IDs of the roles removed
     """
+    if added_roles and removed_roles:
+        title, color = ':orange_square: Role Update', discord.Color.orange()
+    elif added_roles:
+        title, color = ':green_square: Role Update', discord.Color.green()
+    else:
+        title, color = ':negative_squared_cross_mark: Role Update', discord.Color.red()
+
+    changed_by = f'<@{member_who_did_action.id}>' if member_who_did_action is not None else 'Someone'
     embed = discord.Embed(
-        title=':green_square: Role Update'
-        , description=f'<@{member_who_did_action.id}> added a role to <@{some_member.id}> '
-        , color=discord.Color.green()
+        title=title
+        , description=f'{changed_by} updated the roles of <@{some_member.id}>'
+        , color=color
         , timestamp=datetime.utcnow()
     )
 
-    embed.add_field(
-        name='Added role:'
-        , value=f'<@&{role_obj.id}>'
-        , inline=True
-    )
-    return embed
-
-
-def embed_role_remove(some_member, member_who_did_action, role_obj) -> discord.Embed:
-    """
-    Embedding for user kick alerts.
-
-    :param some_member: discord.Member - The receiver of the action
-    :param member_who_did_action: discord.Member - The person who did the action
-    :param role_obj: discord.Role - The role in question
-    """
-    embed = discord.Embed(
-        title=':negative_squared_cross_mark: Role Update'
-        , description=f'<@{member_who_did_action.id}> removed a role from <@{some_member.id}>'
-        , color=discord.Color.red()
-        , timestamp=datetime.utcnow()
-    )
-
-    embed.add_field(
-        name='Removed role:'
-        , value=f'<@&{role_obj.id}>'
-        , inline=True
-    )
+    if added_roles:
+        embed.add_field(
+            name='Added roles:'
+            , value=' '.join(f'<@&{role_id}>' for role_id in added_roles)[:1024]
+            , inline=True
+        )
+    if removed_roles:
+        embed.add_field(
+            name='Removed roles:'
+            , value=' '.join(f'<@&{role_id}>' for role_id in removed_roles)[:1024]
+            , inline=True
+        )
     return embed
 
 
 class LoggingRoles(commands.Cog):
     """
     Simple listener to on_member_update
+
+    Only role changes are logged. The changes of a member are collected for ROLE_LOG_WINDOW seconds,
+    then logged as one entry, with a single audit log lookup for who made them.
     """
 
     def __init__(self, bot) -> None:
         self.bot = bot
+        self.window = float(os.getenv("ROLE_LOG_WINDOW", 5))
+        self.pending = {}
+        self.flushing = set()
+        # Role changes still collected when the cog was reloaded are logged by this version.
+        for (guild, key), (added, removed) in (bot.hot_reload.take(__name__) or {}).items():
+            self.pending[key] = (added, removed, self.schedule_flush(guild, key))
+
+    async def cog_unload(self) -> None:
+        """
+        Hands the role changes still being collected to the next version of the cog when it is reloaded,
+        logs them right away otherwise, and sends the log pipeline's queue before the bot closes.
+        Changes of guilds the bot is no longer in are dropped.
+        """
+        pending, self.pending = self.pending, {}
+        for _, _, timer in pending.values():
+            timer.cancel()
+        guilds = {key: self.bot.get_guild(key[0]) for key in pending}
+        if self.bot.hot_reload.is_reloading(__name__):
+            self.bot.hot_reload.hand_off(__name__, {
+                (guilds[key], key): (added, removed) for key, (added, removed, _) in pending.items()
+                if guilds[key] is not None
+            })
+            await asyncio.gather(*list(self.flushing), return_exceptions=True)
+            return
+
+        self.pending = pending  # flush takes each member's changes from self.pending
+        for key, guild in guilds.items():
+            if guild is not None:
+                self.start_flush(guild, key)
+        await asyncio.gather(*list(self.flushing), return_exceptions=True)
+        # The logs are only queued by now, they are sent after LOG_FLUSH_WINDOW unless drained.
+        await self.bot.log_pipeline.drain()
+
+    def schedule_flush(self, guild, key) -> asyncio.TimerHandle:
+        return asyncio.get_running_loop().call_later(self.window, self.start_flush, guild, key)
+
+    def start_flush(self, guild, key) -> None:
+        # The loop only keeps weak references to tasks, this one is kept until it is done.
+        task = asyncio.create_task(self.flush(guild, key))
+        self.flushing.add(task)
+        task.add_done_callback(self.flushing.discard)
 
     @commands.Cog.listener()
     async def on_member_update(self, before, after) -> None:
         """
-        Checks what roles were changed, and logs it in the log channel.
-        Can be quite spammy.
+        Checks what roles were changed, and queues them for the log channel.
+        Nickname, avatar, timeout and other updates return right away.
+        """
+        before_roles = {role.id for role in before.roles}
+        after_roles = {role.id for role in after.roles}
+        if before_roles == after_roles:
+            return
+
+        key = (after.guild.id, after.id)
+        if key not in self.pending:
+            self.pending[key] = (set(), set(), self.schedule_flush(after.guild, key))
+        added, removed, _ = self.pending[key]
+
+        # A role added then removed within the window cancels out, and the other way around.
+        for role_id in after_roles - before_roles:
+            if role_id in removed:
+                removed.discard(role_id)
+            else:
+                added.add(role_id)
+        for role_id in before_roles - after_roles:
+            if role_id in added:
+                added.discard(role_id)
+            else:
+                removed.add(role_id)
+
+    async def flush(self, guild, key) -> None:
+        """
+        Logs the role changes collected for a member.
         """
-        audit_log = [entry async for entry in before.guild.audit_logs(limit=1)][0]
-
-        if str(audit_log.action) == "AuditLogAction.member_role_update":
-            target_member = audit_log.target
-            responsible_member = audit_log.user
-
-            changed_roles = []
-            # TODO: Replace log channel with entry in the DB.
-            # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-            if len(before.roles) > len(after.roles):
-                for role in before.roles:
-                    if role not in after.roles:
-                        changed_roles.append(role)
-                for item in changed_roles:
-                    embed = embed_role_remove(target_member, responsible_member, item)
-                    logging.info(f"{responsible_member.name} removed {item} from {target_member.name}")
-                    # await logs_channel.send(embed=embed)
-
-            elif len(before.roles) < len(after.roles):
-                for role in after.roles:
-                    if role not in before.roles:
-                        changed_roles.append(role)
-                for item in changed_roles:
-                    embed = embed_role_add(target_member, responsible_member, item)
-                    logging.info(f"{responsible_member.name} added {item} to {target_member.name}")
-                    # await logs_channel.send(embed=embed)
+        added, removed, _ = self.pending.pop(key, (set(), set(), None))
+        if not added and not removed:
+            return
+
+        member = discord.Object(key[1])
+        audit_log = await self.bot.audit_log.find(
+            guild, discord.AuditLogAction.member_role_update, target=member, consume=True
+        )
+        responsible_member = audit_log.user if audit_log is not None else None
+
+        embed = embed_role_update(member, responsible_member, sorted(added), sorted(removed))
+        logger.info(f"{getattr(responsible_member, 'name', 'Someone')} updated the roles of {key[1]}: "
+                    f"+{len(added)} -{len(removed)}")
+        await self.bot.log_pipeline.send(guild, "moderation_log", embed)
 
 
 async def setup(bot: commands.Bot) -> None:
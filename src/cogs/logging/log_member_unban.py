@@ -37,16 +37,14 @@ class LogUnbans(commands.Cog):
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_member_unban(self, member) -> None:
+    async def on_member_unban(self, guild, member) -> None:
         """
         Just listen for the event, embed it, and send it off.
         """
         embed = embed_unban(member)
 
-        logger.info(f"{member.name} was unbanned in {member.guild}")
-        # TODO: Update this to pull form DB!
-        # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-        # await logs_channel.send(embed=embed)
+        logger.info(f"{member.name} was unbanned in {guild}")
+        await self.bot.log_pipeline.send(guild, "moderation_log", embed)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -6,19 +6,25 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 
-def channel_embed(audit_log, message):
+def channel_embed(deleted_by, message):
+    """
+    :param deleted_by: discord.Member, discord.User, StoredMember or discord.Object - who deleted the message
+    :param message: StoredMessage - the deleted message, from the message store
+    """
     embed = discord.Embed(
         title='<:red_circle:1043616578744357085> Deleted Message'
-        , description=f'{audit_log.user} deleted a message'
-                      f'\nIn {audit_log.channel}\nMessage '
-                      f'author: {audit_log.author}'
+        , description=f'<@{deleted_by.id}> deleted a message'
+                      f'\nIn <#{message.channel_id}>\nMessage '
+                      f'author: <@{message.author_id}>'
         , color=discord.Color.dark_red()
         , timestamp=datetime.utcnow()
     )
 
-    embed.set_thumbnail(
-        url=audit_log.user.avatar  # the person who DELETED the message
-    )
+    avatar = getattr(deleted_by, "display_avatar", None) or getattr(deleted_by, "avatar", None)
+    if avatar is not None:
+        embed.set_thumbnail(
+            url=avatar  # the person who DELETED the message
+        )
     if len(message.content) > 1020:
         the_message = message.content[0:1020] + '...'
     else:
@@ -33,36 +39,46 @@ def channel_embed(audit_log, message):
 
 class LogMessages(commands.Cog):
     """
-    Simple listener to on_message_delete
-    then checks the audit log for exact details
+    Simple listener to on_raw_message_delete
+    then checks the audit log for exact details.
+    The content of the message comes from the message store, not from the discord.py message cache.
     """
 
     def __init__(self, bot):
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message):
+    async def on_raw_message_delete(self, payload):
         """
         If a mod deletes, take the audit log event. If a user deletes, handle it normally.
         """
-        audit_log = [entry async for entry in message.guild.audit_logs(limit=1)][0]
+        if payload.guild_id is None:
+            return
+        message = self.bot.message_store.pop(payload.guild_id, payload.message_id)
+        guild = self.bot.get_guild(payload.guild_id)
+        if message is None or guild is None:
+            return
+        author = (guild.get_member(message.author_id)
+                  or await self.bot.db.get_member(guild.id, message.author_id)
+                  or discord.Object(message.author_id))
+
+        audit_log = await self.bot.audit_log.find(
+            guild, discord.AuditLogAction.message_delete, target=author, channel_id=payload.channel_id, consume=True
+        )
 
-        if str(audit_log.action) == 'AuditLogAction.message_delete':
+        if audit_log is not None:
             """            
             If the audit log is triggered, it means someone OTHER than the author deleted the message.
             https://discordpy.readthedocs.io/en/stable/api.html?highlight=audit%20log#discord.AuditLogAction.message_delete
             """
-            logger.info(f"Moderator ({audit_log.user.name}) removed message in {message.channel}")
-            # TODO: Replace log channel with entry in the DB.
-            # embed = channel_embed(audit_log, message)
-            # await logs_channel.send(embed=channel_embed(audit_log, message))
+            logger.info(f"Moderator ({audit_log.user.name}) removed message in {message.channel_id}")
+            await self.bot.log_pipeline.send(guild, "chat_log", channel_embed(audit_log.user, message))
 
             return
 
         else:
-            logger.info(f"{message.author.name} deleted a message in {message.channel}")
-            # TODO: Replace log channel with entry in the DB.
-            # await logs_channel.send(f"{message.author.mention}", embed=channel_embed(message.author, message))
+            logger.info(f"{author.id} deleted a message in {message.channel_id}")
+            await self.bot.log_pipeline.send(guild, "chat_log", channel_embed(author, message))
 
             return
 
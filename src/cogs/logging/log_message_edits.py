@@ -6,23 +6,23 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 
-def channel_embed(author, message_before, message_after) -> discord.Embed:
+def channel_embed(author, message_before, content_after) -> discord.Embed:
     """
     Building the embed object when an event is detected.
     This is only here to keep the actual event cleaner, and easier to read.
-    :param author: discord.member object
-    :param username_before:  The discord.member.name or .nickname of the user before.
-    :param username_after:  The discord.member.name or .nickname of the user after.
+    :param author: discord.member object, StoredMember or discord.Object if the member is not known
+    :param message_before:  StoredMessage - the message before the edit, from the message store
+    :param content_after:  The content of the message after the edit.
     :return: discord.Embed object
     """
     embed = discord.Embed(
         title='<:orange_circle:1043616962112139264> Message Edit'
-        , description=f'Edited by {author.name}\n'
-                      f'In {message_after.channel.mention}'
+        , description=f'Edited by <@{author.id}>\n'
+                      f'In <#{message_before.channel_id}>'
         , color=discord.Color.dark_orange()
         , timestamp=datetime.utcnow()
     )
-    if author.avatar is not None:
+    if getattr(author, "avatar", None) is not None:
         embed.set_thumbnail(
             url=author.avatar
         )
@@ -35,7 +35,7 @@ def channel_embed(author, message_before, message_after) -> discord.Embed:
 
     embed.add_field(
         name='After editing: '
-        , value=message_after.content[:1000]
+        , value=content_after[:1000]
         , inline=False
     )
     return embed
@@ -43,35 +43,44 @@ def channel_embed(author, message_before, message_after) -> discord.Embed:
 
 class LogMessageEdits(commands.Cog):
     """
-    Simple listener to on_message_edit
+    Simple listener to on_raw_message_edit.
+    The content before the edit comes from the message store, not from the discord.py message cache.
     """
 
     def __init__(self, bot) -> None:
         self.bot = bot
 
     @commands.Cog.listener()
-    async def on_message_edit(self, message_before, message_after) -> None:
+    async def on_raw_message_edit(self, payload) -> None:
+        # Edits without new content (embeds loading, pins...) don't change what we log.
+        content_after = payload.data.get("content")
+        if payload.guild_id is None or content_after is None:
+            return
+        message_before = self.bot.message_store.get(payload.guild_id, payload.message_id)
+        if message_before is None:
+            return
+        self.bot.message_store.update(payload.guild_id, payload.message_id, content_after)
 
         # IGNORE /run, since we will set up an on_message_edit handler there with opposite logic
-        if message_before.content.startswith('/run') or message_after.content.startswith('/run'):
+        if message_before.content.startswith('/run') or content_after.startswith('/run'):
             return
 
-        elif message_before.content != message_after.content:
+        elif message_before.content != content_after:
+            guild = self.bot.get_guild(payload.guild_id)
+            if guild is None:
+                return
             # This guy here makes sure we use the displayed name inside the guild.
-            if message_before.author.nick is None:
-                username = message_before.author
-            else:
-                username = message_before.author.nick
-
-            author = message_before.author
+            author = (guild.get_member(message_before.author_id)
+                      or await self.bot.db.get_member(guild.id, message_before.author_id)
+                      or discord.Object(message_before.author_id))
+            username = getattr(author, "display_name", author.id)
 
-            logger.info(f"{username} edited a message in {message_before.channel}")
+            logger.info(f"{username} edited a message in {message_before.channel_id}")
             logger.debug(f" - Message Before: {message_before.content}")
-            logger.debug(f" - Message After: {message_after.content}")
+            logger.debug(f" - Message After: {content_after}")
 
-            # TODO: Replace log channel with entry in the DB.
-            # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["chat_log"])
-            # await logs_channel.send(embed=channel_embed)
+            embed = channel_embed(author, message_before, content_after)
+            await self.bot.log_pipeline.send(guild, "chat_log", embed)
             return
 
 
@@ -12,7 +12,7 @@ def channel_embed(username_before, username_after) -> discord.Embed:
     This is only here to keep the actual event cleaner, and easier to read.
 
     :param username_before:  The discord.member.name or .nickname of the user before.
-    :param username_after:  The discord.member.name or .nickname of the user after.
+    :param username_after:  The discord.member after the change.
     :return: discord.Embed object
     """
     embed = discord.Embed(
@@ -34,7 +34,7 @@ def channel_embed(username_before, username_after) -> discord.Embed:
 
     embed.add_field(
         name='After'
-        , value=username_after
+        , value=username_after.display_name
         , inline=True
     )
 
@@ -67,8 +67,7 @@ class LogNames(commands.Cog):
         if before.nick != after.nick and before.nick is not None:
             logger.info(f"{username_before} changed their name to {username_after}")
 
-            # TODO: Replace log channel with entry in the DB.
-            # await logs_channel.send(f"{username_after.mention}", embed=channel_embed(username_before, username_after))
+            await self.bot.log_pipeline.send(after.guild, "moderation_log", channel_embed(username_before, after))
             return
 
 
@@ -2,6 +2,8 @@ import logging
 import discord
 from discord.ext import commands
 
+from services.scheduler import INTERACTIVE
+
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ class CommandListener(commands.Cog):
         This is an error handler for command errors.
         For a list of command errors -> https://discordpy.readthedocs.io/en/latest/ext/commands/api.html#exceptions
         """
-        await ctx.send("That command does not exist. Try again.")
+        await self.bot.scheduler.send(ctx, "That command does not exist. Try again.", priority=INTERACTIVE)
 
         if isinstance(error, discord.ext.commands.errors.CommandNotFound):
             logger.info(f"ERROR: {ctx.guild.name} -- {ctx.author} -- {error}")
@@ -63,33 +63,30 @@ def embed_ticket_delete(user, ticket_name):
     return embed
 
 
-def embed_ticket_remove(user, ticket_name):
-    """
-    Embed for removal of a new ticket.
-
-    :param user: discord.Member.name
-        - The user that removed the ticket
-    :param ticket_name: discord.Channel.id
-        - The ID of the channel which was removed
-    """
-    embed = discord.Embed(
-        title=f'{str(user)} removed a ticket.',
-        description=f'Ticket: <#{ticket_name}>',
-        color=discord.Color.red(),
-        timestamp=datetime.utcnow(),
-    )
-
-    return embed
-
-
 class LogTickets(commands.Cog):
     """
     Logs all form of thread creation and deletion when [ticket] is involved.
+    Threads are classified by the ticket registry when they are created,
+    events of threads that are not tickets return before reading the audit log.
     """
 
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """
+        Registers the ticket threads that were opened, archived or deleted while the bot was away.
+        Once per process: on_ready fires again after every reconnect, and the gateway replays what was missed.
+        """
+        if self.bot.db.tickets.backfilled:
+            return
+        try:
+            changed = await self.bot.db.tickets.backfill(self.bot.guilds)
+            logger.info(f"Ticket registry backfilled: {changed} tickets added or changed.")
+        except Exception as e:
+            logger.warning(f"Failed to backfill the ticket registry. Error: {e}")
+
     @commands.Cog.listener()
     async def on_thread_create(self, thread) -> None:
         """
@@ -98,53 +95,66 @@ class LogTickets(commands.Cog):
         :param thread: discord.Thread
             - The thread that was created.
         """
-        audit_log = [entry async for entry in thread.guild.audit_logs(limit=1)][0]
+        if await self.bot.db.tickets.register(thread) is None:
+            return
+
+        audit_log = await self.bot.audit_log.find(
+            thread.guild, discord.AuditLogAction.thread_create, target=thread, consume=True
+        )
+        created_by = audit_log.user if audit_log is not None else (thread.owner or thread.owner_id)
+        embed = embed_ticket_create(created_by, thread.mention)
+        logger.info(f"A ticket was created by {created_by}")
+        await self.bot.log_pipeline.send(thread.guild, "moderation_log", embed)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before, after) -> None:
+        """
+        When a thread is updated. Archiving a ticket closes it, unarchiving it opens it again.
 
-        target = "AuditLogAction.thread_create"
-        if str(audit_log.action) == target and str(audit_log.target).startswith("[Ticket]"):
+        :param before: discord.Thread
+            - The thread before the update.
+        :param after: discord.Thread
+            - The thread after the update.
+        """
+        if await self.bot.db.tickets.find(after.id, after) is None:
+            return
+        if before.archived != after.archived:
+            await self.bot.db.tickets.set_status(after.id, "closed" if after.archived else "open")
 
-            # TODO: Update this to pull form DB!
-            # mod_log = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-            embed = embed_ticket_create(audit_log.user, audit_log.target.mention)
-            logger.info(f"A ticket was created by {audit_log.user}")
-            # await mod_log.send(embed=embed)
+        audit_log = await self.bot.audit_log.find(
+            after.guild, discord.AuditLogAction.thread_update, target=after, consume=True
+        )
+        if audit_log is None:
             return
 
+        embed = embed_ticket_update(audit_log.user, after.id)
+        logger.info(f"{audit_log.user} updated a ticket.")
+        await self.bot.log_pipeline.send(after.guild, "moderation_log", embed)
+
     @commands.Cog.listener()
-    async def on_thread_update(self, before) -> None:
+    async def on_raw_thread_delete(self, payload) -> None:
         """
-        When a thread is updated, deleted or removed.
+        When a thread is deleted, whether it is cached or not.
 
-        :param thread: discord.Thread
-            - The thread that was updated.
+        :param payload: discord.RawThreadDeleteEvent
+            - The deleted thread.
         """
-        audit_log = [entry async for entry in before.guild.audit_logs(limit=1)][0]
-
-        update = "AuditLogAction.thread_update"
-        delete = "AuditLogAction.thread_delete"
-        remove = "AuditLogAction.thread_remove"
-
-        if str(audit_log.target).startswith("[Ticket]"):
-            # TODO: Update this to pull form DB!
-            # logs_channel = await self.bot.fetch_channel(self.bot.server_settings.log_channel["mod_log"])
-
-            if str(audit_log.action) == update:
-                embed = embed_ticket_update(audit_log.user, before.id)
-                logger.info(f"{audit_log.user} updated a ticket.")
-                #await logs_channel.send(embed=embed)
-                return
-
-            if str(audit_log.action) == delete:
-                logger.info(f"{audit_log.user} deleted a ticket.")
-                embed = embed_ticket_delete(audit_log.user, before.id)
-                #await logs_channel.send(embed=embed)
-                return
-
-            if str(audit_log.action) == remove:
-                logger.info(f"{audit_log.user} removed a ticket.")
-                embed = embed_ticket_remove(audit_log.user, before.id)
-                #await logs_channel.send(embed=embed)
-                return
+        if await self.bot.db.tickets.find(payload.thread_id, payload.thread, payload.parent_id) is None:
+            return
+        await self.bot.db.tickets.set_status(payload.thread_id, "closed")
+
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild is None:
+            return
+        audit_log = await self.bot.audit_log.find(
+            guild, discord.AuditLogAction.thread_delete, target=discord.Object(payload.thread_id), consume=True
+        )
+        if audit_log is None:
+            return
+
+        logger.info(f"{audit_log.user} deleted a ticket.")
+        embed = embed_ticket_delete(audit_log.user, payload.thread_id)
+        await self.bot.log_pipeline.send(guild, "moderation_log", embed)
 
 
 async def setup(bot: commands.Bot) -> None:
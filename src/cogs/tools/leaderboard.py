@@ -0,0 +1,68 @@
+import logging
+import discord
+from discord.ext import commands
+from datetime import datetime
+
+from services.scheduler import INTERACTIVE
+
+
+logger = logging.getLogger(__name__)
+
+
+def embed_leaderboard(guild, top_members, author, rank, points) -> discord.Embed:
+    """
+    Embedding for the points leaderboard.
+
+    :param guild: discord.Guild
+        - The guild the leaderboard is for
+    :param top_members: list
+        - (member_id, points) tuples, most points first
+    :param author: discord.Member
+        - The member who asked for the leaderboard
+    :param rank: int
+        - The rank of the author, None if they have no points yet
+    :param points: int
+        - The points of the author
+    """
+    embed = discord.Embed(
+        title=f'{guild.name} leaderboard'
+        , description='\n'.join(
+            f'**{position}.** <@{member_id}> - {member_points} points'
+            for position, (member_id, member_points) in enumerate(top_members, start=1)
+        ) or 'Nobody has any points yet.'
+        , color=discord.Color.gold()
+        , timestamp=datetime.utcnow()
+    )
+
+    embed.set_footer(
+        text=f'{author.display_name}: rank #{rank} with {points} points' if rank
+        else f'{author.display_name}: no points yet'
+    )
+    return embed
+
+
+class Leaderboard(commands.Cog):
+    """
+    Shows the members with the most points in the guild.
+    """
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @commands.hybrid_command()
+    async def leaderboard(self, ctx: commands.Context, limit: int = 10) -> None:
+        """
+        Shows the top members by points, and your own rank.
+        """
+        logger.debug("Leaderboard command used.")
+        if ctx.guild is None:
+            return
+
+        top_members = await self.bot.db.get_leaderboard(ctx.guild.id, max(1, min(limit, 25)))
+        rank, points = await self.bot.db.get_rank(ctx.guild.id, ctx.author.id)
+        embed = embed_leaderboard(ctx.guild, top_members, ctx.author, rank, points)
+        await self.bot.scheduler.send(ctx, embed=embed, priority=INTERACTIVE)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Leaderboard(bot))
@@ -1,6 +1,9 @@
 import logging
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+from datetime import datetime
+
+from db.point_accumulator import PointAccumulator
 
 
 logger = logging.getLogger(__name__)
@@ -9,6 +12,30 @@ logger = logging.getLogger(__name__)
 class MessagePoints(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        # Points still pending when the cog was reloaded are handed over, see services.hot_reload.
+        self.points = bot.hot_reload.take(__name__) or PointAccumulator(bot.db)
+
+    async def cog_load(self) -> None:
+        """Start writing points to the DB in the background."""
+        self.points.start()
+        self.rollup_ledger.start()
+
+    async def cog_unload(self) -> None:
+        """Write the points that are still pending before the cog goes away, or hand them to its next version."""
+        self.rollup_ledger.cancel()
+        if self.bot.hot_reload.is_reloading(__name__):
+            self.bot.hot_reload.hand_off(__name__, self.points, dispose=self.points.stop)
+            return
+        await self.points.stop()
+        logger.info(f"Points flushed on unload: {self.points.stats()}")
+
+    @tasks.loop(hours=1)
+    async def rollup_ledger(self) -> None:
+        """Keeps the point ledger small, see DB.rollup_point_ledger."""
+        try:
+            await self.bot.db.rollup_point_ledger()
+        except Exception as e:
+            logger.warning(f"Failed to roll up the point ledger. Error: {e}")
 
     """
     Adding and removing members from the DB
@@ -16,12 +43,25 @@ class MessagePoints(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         """When a member joins, add them to the DB."""
-        self.bot.db.add_member_to_points_table(member, member.guild.id, member.id)
+        await self.bot.db.add_member_to_members_table(
+            member.guild.id
+            , member.id
+            , member.name
+            , str(member.avatar)
+            , member.nick
+            , member.display_name
+            , str(member.top_role)
+            , member.created_at
+            , member.joined_at
+            , datetime.now()
+        )
+        await self.bot.db.add_member_to_points_table(member.guild.id, member.id, 0)
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member: discord.Member):  # pylint: disable=E1101
-        """When a member leaves, remove them from the DB."""
-        self.bot.db.delete_member_from_points_table(member.guild.id, member.id)
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        """When a member leaves, remove them from the DB. The raw event fires for uncached members too."""
+        self.points.discard(payload.guild_id, payload.user.id)
+        await self.bot.db.delete_member_from_points_table(payload.guild_id, payload.user.id)
 
     """
     On_message events
@@ -29,16 +69,27 @@ class MessagePoints(commands.Cog):
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         """When a member sends a message, give them points."""
-        if message.author.bot:
+        if message.author.bot or message.guild is None:
             return
         message_value = len(message.content.split(" "))
-        self.bot.db.add_points(message.author.id, abs(message_value))
+        self.points.award(message.id, message.guild.id, message.author.id, abs(message_value))
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        """When a member deletes a message, remove points."""
-        message_value = len(message.content.split(" "))
-        self.bot.db.remove_points(message.author.id, abs(message_value))
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """
+        When a message is deleted, take back the points it earned.
+        Raw events fire for every message, cached or not. The points come from the ledger.
+        """
+        if payload.guild_id is None:
+            return
+        self.points.revert([payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """When messages are purged, take back the points they all earned at once."""
+        if payload.guild_id is None:
+            return
+        self.points.revert(payload.message_ids)
 
 
 async def setup(bot: commands.Bot) -> None:
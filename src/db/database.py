@@ -1,15 +1,67 @@
 import os
+import asyncio
 import logging
-import time
-import psycopg2 as psycopg
-from psycopg2 import OperationalError, Error
+import random
+import hashlib
+import psycopg
+from psycopg import OperationalError, Error
+from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
 from datetime import datetime
+from itertools import islice
 from discord.ext.commands import Bot
 
+from db.leaderboard import Leaderboard
+from db.member_cache import MemberCache
+from db.notify import CacheNotifier
+from db.settings_cache import SettingsCache, LOG_TYPES
+from db.ticket_registry import TicketRegistry
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATIONS_LOCK_ID = 4_242_001  # pg advisory lock key, so only one process migrates at a time.
+
+# Points reference members, which reference guilds, but members are only written on join and by the sync.
+# The writes first add the rows they reference, when they are missing, as placeholders:
+# only their IDs are set, name stays NULL until the member joins again or the next sync fills them in.
+# Takes the guild IDs, as an array.
+KNOWN_GUILDS_CTE = """
+                known_guilds AS (
+                    INSERT INTO
+                        guilds (discord_guild_id)
+                    SELECT DISTINCT
+                        guild_id
+                    FROM
+                        unnest((%s)::BIGINT[]) AS referenced (guild_id)
+                    ON CONFLICT (discord_guild_id) DO NOTHING
+                )"""
+
+# Takes the guild IDs and the member IDs, as two arrays.
+KNOWN_MEMBERS_CTE = KNOWN_GUILDS_CTE + """, known_members AS (
+                    INSERT INTO
+                        members (discord_guild_id, discord_member_id)
+                    SELECT DISTINCT
+                        guild_id, member_id
+                    FROM
+                        unnest((%s)::BIGINT[], (%s)::BIGINT[]) AS referenced (guild_id, member_id)
+                    ON CONFLICT (discord_guild_id, discord_member_id) DO NOTHING
+                )"""
+
+
+def fingerprint(fields):
+    """
+    Builds a compact fingerprint of the fields the sync writes for an entity.
+    Used to tell if a row changed since the last sync, without comparing every column.
+
+    :param fields: tuple of the values to fingerprint
+    :return: int - a signed 64 bit hash, fits in a BIGINT column
+    """
+    digest = hashlib.blake2b(repr(fields).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
 """
 A database class that implements database methods in different layers.
 Layer 1: Basic Database interaction.
@@ -29,8 +81,12 @@ class DB:
 
     def __init__(self, discord_client):
         """
-        Initialize the database, create a connection using the provided
-        database connection string, create a cursor and define the client.
+        Initialize the database, build the connection string and create
+        an (unopened) async connection pool for it, then define the client.
+
+        The pool is configured through the environment:
+        POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE, POSTGRES_POOL_MAX_IDLE
+        and POSTGRES_POOL_MAX_LIFETIME (both in seconds).
 
         Parameters
         ----------
@@ -46,15 +102,54 @@ class DB:
                             f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}"
                             f"/{os.getenv('POSTGRES_DB')}")
 
-        # self.connection = psycopg.connect(self.conn_string)
-        # self.cursor = self.connection.cursor()
+        self.pool = AsyncConnectionPool(
+            self.conn_string
+            , min_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2))
+            , max_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
+            , max_idle=float(os.getenv("POSTGRES_POOL_MAX_IDLE", 300))
+            , max_lifetime=float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", 3600))
+            , check=AsyncConnectionPool.check_connection
+            , name="zorak"
+            , open=False
+        )
 
         self.discord_client = discord_client
+        self.leaderboard = Leaderboard(self)
+        self.settings = SettingsCache(self)
+        self.member_cache = MemberCache(self)
+        self.tickets = TicketRegistry(self)
+        self.notifier = CacheNotifier(self)
 
         logger.debug(f"Connecting to: {self.conn_string}")
         logger.debug(f"Using {discord_client} as discord client")
 
-    def select_one(self, query, *data):
+    async def open(self):
+        """
+        Open the connection pool.
+        Connections are created in the background, up to the configured min size.
+        """
+        await self.pool.open()
+        logger.info(f"Connection pool opened: {self.pool_stats()}")
+
+    async def close(self):
+        """
+        Stop listening for cache notifications, then close the connection pool, and every connection in it.
+        """
+        await self.notifier.stop()
+        await self.pool.close()
+        logger.info("Connection pool closed.")
+
+    def pool_stats(self):
+        """
+        Returns the current statistics of the connection pool.
+
+        Returns
+        -------
+        :return: dict - pool size, available connections, waiting requests, etc.
+        """
+        return self.pool.get_stats()
+
+    async def select_one(self, query, *data):
         """
         Execute a query and return the first result.
 
@@ -67,18 +162,11 @@ class DB:
         -------
         :return: The first result of the query
         """
-        connection = psycopg.connect(self.conn_string)
-        cursor = connection.cursor()
-        if data:
-            cursor.execute(query, data)
-        else:
-            cursor.execute(query)
-        data = cursor.fetchone()
-        connection.commit()
-        connection.close()
-        return data
+        async with self.pool.connection() as connection:
+            cursor = await connection.execute(query, data or None)
+            return await cursor.fetchone()
 
-    def select_all(self, query, *data):
+    async def select_all(self, query, *data):
         """
         Execute a query and return all results.
 
@@ -91,18 +179,11 @@ class DB:
         -------
         :return: All results of the query
         """
-        connection = psycopg.connect(self.conn_string)
-        cursor = connection.cursor()
-        if data:
-            cursor.execute(query, data)
-        else:
-            cursor.execute(query)
-        data = cursor.fetchall()
-        connection.commit()
-        connection.close()
-        return data
+        async with self.pool.connection() as connection:
+            cursor = await connection.execute(query, data or None)
+            return await cursor.fetchall()
 
-    def update(self, query, data):
+    async def update(self, query, data):
         """
         Execute an update query.
 
@@ -115,14 +196,10 @@ class DB:
         -------
         :return: None - updates the database
         """
-        connection = psycopg.connect(self.conn_string)
-        cursor = connection.cursor()
+        async with self.pool.connection() as connection:
+            await connection.execute(query, data)
 
-        cursor.execute(query, data)
-        connection.commit()
-        connection.close()
-
-    def insert(self, query, data):
+    async def insert(self, query, data):
         """
         Execute an insert query.
 
@@ -135,14 +212,10 @@ class DB:
         -------
         :return: None - inserts into the database
         """
-        connection = psycopg.connect(self.conn_string)
-        cursor = connection.cursor()
-
-        cursor.execute(query, data)
-        connection.commit()
-        connection.close()
+        async with self.pool.connection() as connection:
+            await connection.execute(query, data)
 
-    def delete(self, query, data):
+    async def delete(self, query, data):
         """
         Execute a delete query.
 
@@ -155,38 +228,171 @@ class DB:
         -------
         :return: None - deletes an entry in the database
         """
-        connection = psycopg.connect(self.conn_string)
-        cursor = connection.cursor()
+        async with self.pool.connection() as connection:
+            await connection.execute(query, data)
 
-        cursor.execute(query, data)
-        connection.commit()
-        connection.close()
+    async def upsert_many(self, table, columns, conflict_columns, rows, update_columns=None
+                          , fingerprint_column=None):
+        """
+        Bulk insert or update rows in a table.
+        Rows are streamed with COPY into a temporary staging table, which is then
+        merged into the target table with a single INSERT ... ON CONFLICT DO UPDATE.
+        This happens in batches of DB_SYNC_BATCH_SIZE rows, one transaction per batch.
 
-    def healthcheck(self):
-        healthy = False
-        if not healthy:
-            for i in range(5):
-                try:
-                    with psycopg.connect(self.conn_string):
-                        logger.info("PostgreSQL is online and ready to accept connections.")
-                        healthy = True
-                        break
+        When a fingerprint column is given, existing rows are only rewritten
+        if their fingerprint differs from the staged one.
 
-                except OperationalError as e:
-                    logger.critical(f"Error: {e}")
+        The conflict columns must be covered by a unique index on the table.
+
+        Parameters
+        ----------
+        :param table: The name of the table to write to
+        :param columns: The names of the columns, in the order they appear in each row
+        :param conflict_columns: The columns that identify a row
+        :param rows: An iterable of tuples, one per row
+        :param update_columns: The columns to overwrite when a row already exists.
+            Defaults to every column that is not a conflict column.
+            An empty list means existing rows are left untouched.
+        :param fingerprint_column: The column holding the fingerprint of the row, if any
+
+        Returns
+        -------
+        :return: dict - the number of rows inserted, updated and skipped
+        """
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in conflict_columns]
+
+        staging = f"staging_{table}"
+        column_list = ", ".join(columns)
+        conflict_list = ", ".join(conflict_columns)
+        if update_columns:
+            on_conflict = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+            if fingerprint_column:
+                on_conflict += (f" WHERE {table}.{fingerprint_column}"
+                                f" IS DISTINCT FROM EXCLUDED.{fingerprint_column}")
+        else:
+            on_conflict = "DO NOTHING"
+
+        # xmax is 0 for freshly inserted rows, which tells inserts and updates apart.
+        merge_query = f"""
+                        INSERT INTO {table} ({column_list})
+                        SELECT DISTINCT ON ({conflict_list}) {column_list}
+                        FROM {staging}
+                        ON CONFLICT ({conflict_list}) {on_conflict}
+                        RETURNING (xmax = 0)
+                        """
+        batch_size = int(os.getenv("DB_SYNC_BATCH_SIZE", 5000))
+        rows = iter(rows)
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+        async with self.pool.connection() as connection:
+            while batch := list(islice(rows, batch_size)):
+                async with connection.transaction():
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                                             f"SELECT {column_list} FROM {table} WITH NO DATA")
+                        async with cursor.copy(f"COPY {staging} ({column_list}) FROM STDIN") as copy:
+                            for row in batch:
+                                await copy.write_row(row)
+                        await cursor.execute(merge_query)
+                        written = await cursor.fetchall()
+
+                inserted = sum(1 for (is_insert,) in written if is_insert)
+                counts["inserted"] += inserted
+                counts["updated"] += len(written) - inserted
+                counts["skipped"] += len(batch) - len(written)
+                logger.debug(f"Upserted a batch of {len(batch)} rows into {table}")
+        return counts
+
+    async def delete_missing(self, table, scope_column, key_column, present_keys):
+        """
+        Deletes the rows of a table that are no longer present in discord.
+        Only the scopes (usually guilds) passed in are touched.
+
+        Parameters
+        ----------
+        :param table: The name of the table to delete from
+        :param scope_column: The column the keys are grouped by, e.g. discord_guild_id
+        :param key_column: The column identifying a row within its scope
+        :param present_keys: dict - scope value -> list of the keys that still exist
+
+        Returns
+        -------
+        :return: int - the number of rows deleted
+        """
+        query = f"""
+                DELETE FROM
+                    {table}
+                WHERE
+                    {scope_column} = (%s)
+                    AND NOT ({key_column} = ANY(%s))
+                """
+        deleted = 0
+        async with self.pool.connection() as connection:
+            for scope, keys in present_keys.items():
+                cursor = await connection.execute(query, (scope, list(keys)))
+                deleted += cursor.rowcount
+        return deleted
+
+    async def healthcheck(self, attempts=None, backoff=None, backoff_max=None):
+        """
+        Waits for PostgreSQL to accept connections, without blocking the event loop.
+        Retries with a jittered exponential backoff: backoff, 2x backoff, 4x backoff... capped at backoff_max.
+
+        Parameters
+        ----------
+        :param attempts: Number of connection attempts, POSTGRES_HEALTHCHECK_ATTEMPTS by default
+        :param backoff: Seconds before the first retry, POSTGRES_HEALTHCHECK_BACKOFF by default
+        :param backoff_max: Most seconds between two attempts, POSTGRES_HEALTHCHECK_BACKOFF_MAX by default
+
+        Returns
+        -------
+        :return: bool - whether PostgreSQL accepted a connection
+        """
+        attempts = attempts or int(os.getenv("POSTGRES_HEALTHCHECK_ATTEMPTS", 5))
+        backoff = backoff or float(os.getenv("POSTGRES_HEALTHCHECK_BACKOFF", 1))
+        backoff_max = backoff_max or float(os.getenv("POSTGRES_HEALTHCHECK_BACKOFF_MAX", 30))
+
+        for attempt in range(attempts):
+            try:
+                connection = await psycopg.AsyncConnection.connect(self.conn_string, connect_timeout=10)
+                await connection.close()
+                logger.info("PostgreSQL is online and ready to accept connections.")
+                return True
+            except Error as e:
+                logger.critical(f"Error: {e}")
+                if isinstance(e, OperationalError):
                     logger.critical("PostgreSQL is not available or not ready to accept connections.")
-                    logger.critical(f"Retrying in 10 seconds. Attempt #{i}")
-                    time.sleep(10)
+                if attempt == attempts - 1:
+                    break
+                # Full jitter, so restarting processes do not all retry at the same time.
+                delay = random.uniform(0, min(backoff_max, backoff * 2 ** attempt))
+                logger.critical(f"Retrying in {delay:.1f} seconds. Attempt #{attempt}")
+                await asyncio.sleep(delay)
 
+        logger.critical(f"PostgreSQL did not accept connections after {attempts} attempts.")
+        return False
 
-                except Error as e:
-                    logger.critical(f"Error: {e}")
-                    logger.critical(f"Retrying in 10 seconds. Attempt #{i}")
+    async def ping(self, timeout=2):
+        """
+        Runs a trivial query through the pool, to tell if the database answers.
 
-                    time.sleep(10)
+        Parameters
+        ----------
+        :param timeout: Seconds to wait for a connection of the pool, and for the answer
 
-        if healthy:
+        Returns
+        -------
+        :return: bool - whether the database answered in time
+        """
+        try:
+            async with asyncio.timeout(timeout):
+                async with self.pool.connection(timeout=timeout) as connection:
+                    await connection.execute("SELECT 1")
             return True
+        except Exception as e:
+            logger.warning(f"Database ping failed. Error: {e}")
+            return False
 
     """ 
     2nd Layer.
@@ -194,7 +400,7 @@ class DB:
     - Existence Checks
     """
 
-    def is_data_in_db(self, table_name, column_name, value):
+    async def is_data_in_db(self, table_name, column_name, value):
         """
         Check if a value is in the database.
 
@@ -209,13 +415,13 @@ class DB:
         :return: boolean - if the data is in the database
         """
         query = f"SELECT * FROM {table_name} WHERE {column_name} = (%s)"
-        data = self.select_one(query, (value,))
+        data = await self.select_one(query, value)
 
         if data is None:
             return False
         return True
 
-    def is_guild_in_db(self, guild_id):
+    async def is_guild_in_db(self, guild_id):
         """
         Check if a guild is in the database.
 
@@ -227,9 +433,9 @@ class DB:
         -------
         :return: boolean - if the guild is in the database
         """
-        return self.is_data_in_db("guilds", "discord_guild_id", str(guild_id))
+        return await self.is_data_in_db("guilds", "discord_guild_id", int(guild_id))
 
-    def is_settings_in_db(self, guild_id):
+    async def is_settings_in_db(self, guild_id):
         """
         Check if the settings for a guild is in the database.
 
@@ -241,9 +447,9 @@ class DB:
         -------
         :return: boolean - if the settings for a guild are in the database
         """
-        return self.is_data_in_db("bot_settings", "discord_guild_id", str(guild_id))
+        return await self.is_data_in_db("bot_settings", "discord_guild_id", int(guild_id))
 
-    def is_channel_in_db(self, channel_id):
+    async def is_channel_in_db(self, channel_id):
         """
         Check if a channel is in the database.
 
@@ -255,9 +461,9 @@ class DB:
         -------
         :return: boolean - if the channel is in the database
         """
-        return self.is_data_in_db("channels", "channel_id", str(channel_id))
+        return await self.is_data_in_db("channels", "channel_id", int(channel_id))
 
-    def is_member_in_db(self, member_id):
+    async def is_member_in_db(self, member_id):
         """
         Check if a member is in the database.
 
@@ -269,9 +475,9 @@ class DB:
         -------
         :return: boolean - if the member is in the database
         """
-        return self.is_data_in_db("members", "discord_member_id", str(member_id))
+        return await self.is_data_in_db("members", "discord_member_id", int(member_id))
 
-    def is_role_in_db(self, role_id):
+    async def is_role_in_db(self, role_id):
         """
         Check if a role is in the database.
 
@@ -283,9 +489,9 @@ class DB:
         -------
         :return: boolean - if the role is in the database
         """
-        return self.is_data_in_db("roles", "role_id", str(role_id))
+        return await self.is_data_in_db("roles", "role_id", int(role_id))
 
-    def is_command_in_db(self, command_id):
+    async def is_command_in_db(self, command_id):
         """
         Check if a command is in the database.
 
@@ -297,9 +503,9 @@ class DB:
         -------
         :return: boolean - if the command is in the database
         """
-        return self.is_data_in_db("commands", "command_id", str(command_id))
+        return await self.is_data_in_db("commands", "command_id", str(command_id))
 
-    def get_all_tables_in_database(self):
+    async def get_all_tables_in_database(self):
         """
         Returns a list of all tables in the database
 
@@ -307,7 +513,7 @@ class DB:
         """
         query = ("SELECT table_name FROM information_schema.tables"
                  " WHERE table_schema='public';")
-        return self.select_all(query)
+        return await self.select_all(query)
 
     """
     3rd Layer. 
@@ -318,8 +524,8 @@ class DB:
     """
 
     # ---------- Add commands
-    def add_guild_to_guilds_table(self, g_name, g_logo, g_created_at, g_member_count, g_nsfw_level
-                                  , g_language, discord_guild_id, is_premium, is_test, dt_now):
+    async def add_guild_to_guilds_table(self, g_name, g_logo, g_created_at, g_member_count, g_nsfw_level
+                                        , g_language, discord_guild_id, is_premium, is_test, dt_now):
         """
         Adds a guild to the database, along with all of its corresponding information
 
@@ -344,9 +550,9 @@ class DB:
                         VALUES((%s), (%s), (%s), (%s),(%s), (%s), (%s), (%s), (%s), (%s))"""
         try:
             logger.debug(f"Attempting to add guild: {g_name}")
-            self.insert(
+            await self.insert(
                 query
-                , (str(discord_guild_id)
+                , (int(discord_guild_id)
                    , g_name
                    , g_logo
                    , g_member_count
@@ -360,8 +566,8 @@ class DB:
         except Exception as e:
             logger.warning(f"Failed to add guild '{g_name}' to database. Error: {e}")
 
-    def add_settings_to_bot_settings_table(self, discord_guild_id, discord_member_id, admin, moderation
-                                           , logs, antispam, fun, dt_now):
+    async def add_settings_to_bot_settings_table(self, discord_guild_id, discord_member_id, admin, moderation
+                                                 , logs, antispam, fun, dt_now):
         """
         Adds guild settings to the database
 
@@ -384,10 +590,10 @@ class DB:
                 """
         try:
             logger.debug(f"Attempting to add bot_settings to guild ID: {discord_guild_id}")
-            self.insert(
+            await self.insert(
                 query
-                , (str(discord_guild_id)
-                   , discord_member_id
+                , (int(discord_guild_id)
+                   , int(discord_member_id)
                    , admin
                    , logs
                    , moderation
@@ -396,12 +602,14 @@ class DB:
                    , dt_now
                    )
             )
+            self.settings.invalidate(discord_guild_id)
+            await self.notifier.publish("settings", guild_id=int(discord_guild_id))
         except Exception as e:
             logger.warning(f"Failed to add bot_settings for guild ID: '{discord_guild_id}' to database. Error: {e}")
 
-    def add_channel_to_channel_table(self, guild_id, channel_id, name, category
-                                     , position, mention, jump_url, permissions_synced
-                                     , overwrites, created_at, last_synced):
+    async def add_channel_to_channel_table(self, guild_id, channel_id, name, category
+                                           , position, mention, jump_url, permissions_synced
+                                           , overwrites, created_at, last_synced):
         """
         Adds all guild channel information to the database
 
@@ -438,10 +646,10 @@ class DB:
                             """
         try:
             logger.debug(f"Adding channel:{name} to: {guild_id}")
-            self.insert(
+            await self.insert(
                 query, (
-                    str(guild_id)
-                    , str(channel_id)
+                    int(guild_id)
+                    , int(channel_id)
                     , name
                     , category
                     , position
@@ -456,8 +664,8 @@ class DB:
         except Exception as e:
             logger.warning(f"Failed to add channel '{name}' in Guild ID: '{guild_id}' to database. Error: {e}")
 
-    def add_member_to_members_table(self, guild_id, member_id, name, avatar, nickname
-                                    , display_name, top_role, created_at, joined_at, last_synced):
+    async def add_member_to_members_table(self, guild_id, member_id, name, avatar, nickname
+                                          , display_name, top_role, created_at, joined_at, last_synced):
         """
         Adds member from a specified guild to the database
 
@@ -475,24 +683,33 @@ class DB:
         :param last_synced: the datetime when the channel was last synced
 
         """
-        query = """INSERT 
+        query = f"""WITH {KNOWN_GUILDS_CTE}
+                        INSERT
                         INTO members
                             (discord_guild_id, discord_member_id, name, avatar, nickname
                             , display_name, top_role, joined_at, created_at, last_sync)
                         VALUES((%s),(%s),(%s),(%s),(%s),(%s),(%s),(%s),(%s),(%s))
+                        ON CONFLICT (discord_guild_id, discord_member_id) DO UPDATE SET
+                            name = EXCLUDED.name, avatar = EXCLUDED.avatar, nickname = EXCLUDED.nickname
+                            , display_name = EXCLUDED.display_name, top_role = EXCLUDED.top_role
+                            , joined_at = EXCLUDED.joined_at, created_at = EXCLUDED.created_at
+                            , last_sync = EXCLUDED.last_sync
+                        WHERE members.name IS NULL  -- Only placeholders added by the point writes
                             """
         try:
             logger.debug(f"Adding member:{name} to: {guild_id}")
-            self.insert(query,
-                        (str(guild_id), str(member_id), name, avatar, nickname
-                         , display_name, top_role, joined_at, created_at, last_synced))
+            await self.insert(query,
+                              ([int(guild_id)], int(guild_id), int(member_id), name, avatar, nickname
+                               , display_name, top_role, joined_at, created_at, last_synced))
+            self.member_cache.invalidate(guild_id, member_id)
+            await self.notifier.publish("member_update", guild_id=int(guild_id), member_id=int(member_id))
         except Exception as e:
             logger.warning(f"Failed to add member '{name}, {member_id}' in Guild ID: '{guild_id}' to database."
                            f" Error: {e}")
 
-    def add_role_to_roles_table(self, id_guild, role_id, role_name, position, color
-                                , hoisted, mentionable, managed, permissions, created_at
-                                , last_synced):
+    async def add_role_to_roles_table(self, id_guild, role_id, role_name, position, color
+                                      , hoisted, mentionable, managed, permissions, created_at
+                                      , last_synced):
         """
         Adds all roles from a specified guild to the database
 
@@ -529,10 +746,10 @@ class DB:
                             """
         try:
             logger.debug(f"Adding role:{role_name} to: {id_guild}")
-            self.insert(
+            await self.insert(
                 query, (
-                    str(id_guild)
-                    , str(role_id)
+                    int(id_guild)
+                    , int(role_id)
                     , role_name
                     , position
                     , color
@@ -547,7 +764,7 @@ class DB:
         except Exception as e:
             logger.warning(f"Failed to add role: {role_id} from guild: {id_guild}. Error: {e}")
 
-    def add_member_to_points_table(self, guild_id, member_id, points):
+    async def add_member_to_points_table(self, guild_id, member_id, points):
         """
 
         :param id_guild: The ID of the Guild
@@ -555,15 +772,17 @@ class DB:
         :param points: The amount of points
 
         """
-        query = """INSERT 
+        query = f"""WITH {KNOWN_MEMBERS_CTE}
+                        INSERT
                         INTO points
                             (discord_guild_id, discord_member_id, points)
                         VALUES((%s),(%s),(%s))
+                        ON CONFLICT (discord_guild_id, discord_member_id) DO NOTHING
                             """
         try:
             logger.debug(f"Adding member to points table:{member_id} in {guild_id}")
-            self.insert(query,
-                        (str(guild_id), str(member_id), 0))
+            await self.insert(query,
+                              ([int(guild_id)], [int(guild_id)], [int(member_id)], int(guild_id), int(member_id), 0))
         except Exception as e:
             logger.warning(f"Failed to add member to points table: '{member_id}' in Guild ID: '{guild_id}'."
                            f" Error: {e}")
@@ -572,8 +791,8 @@ class DB:
 
 
     # ---------- Update commands
-    def update_guild_info(self, g_name, g_logo, g_created_at, g_member_count
-                          , g_nsfw_level, g_language, dt_now, guild_id):
+    async def update_guild_info(self, g_name, g_logo, g_created_at, g_member_count
+                                , g_nsfw_level, g_language, dt_now, guild_id):
         """
         Update guild information in the database.
 
@@ -603,7 +822,7 @@ class DB:
                             discord_guild_id = (%s)"""
         try:
             logger.debug(f"Updating guild: {g_name}, {guild_id}")
-            self.update(
+            await self.update(
                 query
                 , (g_name
                    , g_logo
@@ -612,13 +831,13 @@ class DB:
                    , g_nsfw_level
                    , g_language
                    , dt_now
-                   , str(guild_id))
+                   , int(guild_id))
             )
         except Exception as e:
             logger.warning(f"failed to update guild: {g_name}, {guild_id}. Error: {e}")
 
-    def update_member_info(self, guild_id, member_id, name, avatar, created_at
-                           , nickname, display_name, joined_at):
+    async def update_member_info(self, guild_id, member_id, name, avatar, created_at
+                                 , nickname, display_name, joined_at):
         """
         Updates all member information in the database.
 
@@ -647,23 +866,25 @@ class DB:
                         """
         try:
             logger.debug(f"Updating member: {name} in guild: {guild_id}")
-            self.update(
+            await self.update(
                 query
-                , (str(guild_id)
+                , (int(guild_id)
                    , name
                    , avatar
                    , created_at
                    , nickname
                    , display_name
                    , joined_at
-                   , str(member_id))
+                   , int(member_id))
             )
+            self.member_cache.invalidate(guild_id, member_id)
+            await self.notifier.publish("member_update", guild_id=int(guild_id), member_id=int(member_id))
         except Exception as e:
             logger.warning(f"Failed to update member: {name} in guild: {guild_id}. Error: {e}")
 
-    def update_role_in_db(self, id_guild, role_id, role_name, position, color
-                          , hoisted, mentionable, managed, permissions, created_at
-                          , last_synced):
+    async def update_role_in_db(self, id_guild, role_id, role_name, position, color
+                                , hoisted, mentionable, managed, permissions, created_at
+                                , last_synced):
         """
         Updates all roles in the database.
 
@@ -699,15 +920,15 @@ class DB:
                         """
         try:
             logger.debug(f"Updating role: {role_name} in guild: {id_guild}")
-            self.update(query, (
-                str(id_guild), role_name, position, color, hoisted, mentionable
-                , managed, permissions, created_at, last_synced, str(role_id)))
+            await self.update(query, (
+                int(id_guild), role_name, position, color, hoisted, mentionable
+                , managed, permissions, created_at, last_synced, int(role_id)))
         except Exception as e:
             logger.warning(f"Failed to update role: {role_name} in guild: {id_guild}. Error: {e}")
 
-    def update_channel_in_db(self, guild_id, channel_id, name, category
-                             , position, mention, jump_url, permissions_synced
-                             , overwrites, created_at, last_synced):
+    async def update_channel_in_db(self, guild_id, channel_id, name, category
+                                   , position, mention, jump_url, permissions_synced
+                                   , overwrites, created_at, last_synced):
         """
         Updates all channel information for a guild in the database.
 
@@ -743,15 +964,15 @@ class DB:
                         """
         try:
             logger.debug(f"Updating channel: {name} in guild: {guild_id}")
-            self.update(query, (
-                str(guild_id), name, category, position, mention, jump_url
+            await self.update(query, (
+                int(guild_id), name, category, position, mention, jump_url
                 , permissions_synced, overwrites, created_at, last_synced
-                , str(channel_id)))
+                , int(channel_id)))
         except Exception as e:
             logger.warning(f"Failed to update channel: {name} in guild: {guild_id}. Error: {e}")
 
     # ---------- Delete commands
-    def delete_guild(self, guild_id):
+    async def delete_guild(self, guild_id):
         """
         removes a guild from the database
 
@@ -760,18 +981,24 @@ class DB:
         :param guild_id: The guild ID
         """
         query = """
-                DELETE
+                DELETE FROM
                     guilds
                 WHERE
                     discord_guild_id = (%s)
                 """
         try:
             logger.debug(f"Deleting guild: {guild_id}")
-            self.delete(query, (str(guild_id),))
+            await self.delete(query, (int(guild_id),))
+            # Its members, points and settings go with it.
+            self.member_cache.invalidate(guild_id)
+            self.leaderboard.invalidate(guild_id)
+            self.settings.invalidate(guild_id)
+            await self.notifier.publish("members", guild_id=int(guild_id))
+            await self.notifier.publish("settings", guild_id=int(guild_id))
         except Exception as e:
             logger.warning(f"Failed to delete guild: {guild_id}. Error: {e}")
 
-    def delete_member(self, member_id, guild_id):
+    async def delete_member(self, member_id, guild_id):
         """
         Deletes a member from the database.
 
@@ -789,11 +1016,15 @@ class DB:
                 """
         try:
             logger.debug(f"Deleting member: {member_id} from guild: {guild_id}")
-            self.delete(query, (member_id, str(guild_id),))
+            await self.delete(query, (int(member_id), int(guild_id),))
+            # Their points row goes with them.
+            self.leaderboard.remove(guild_id, member_id)
+            self.member_cache.invalidate(guild_id, member_id)
+            await self.notifier.publish("members", guild_id=int(guild_id), member_id=int(member_id))
         except Exception as e:
             logger.warning(f"Failed to delete member: {member_id} from guild: {guild_id}. Error: {e}")
 
-    def delete_role(self, role_id, guild_id):
+    async def delete_role(self, role_id, guild_id):
         """
         Deletes a role from the database.
 
@@ -811,11 +1042,11 @@ class DB:
                 """
         try:
             logger.debug(f"Deleting role: {role_id} in guild: {guild_id}")
-            self.delete(query, (role_id, str(guild_id),))
+            await self.delete(query, (int(role_id), int(guild_id),))
         except Exception as e:
             logger.warning(f"Failed to delete role: {role_id} from guild: {guild_id}. Error: {e}")
 
-    def delete_channel(self, channel_id, guild_id):
+    async def delete_channel(self, channel_id, guild_id):
         """
         Deletes a channel from the database.
 
@@ -833,11 +1064,11 @@ class DB:
                 """
         try:
             logger.debug(f"Deleting channel: {channel_id} in guild: {guild_id}")
-            self.delete(query, (channel_id, str(guild_id),))
+            await self.delete(query, (int(channel_id), int(guild_id),))
         except Exception as e:
             logger.warning(f"Failed to delete channel: {channel_id} from guild: {guild_id}. Error: {e}")
 
-    def delete_member_from_points_table(self, guild_id, member_id):
+    async def delete_member_from_points_table(self, guild_id, member_id):
         """
 
         :param id_guild: The ID of the Guild
@@ -852,8 +1083,10 @@ class DB:
                 """
         try:
             logger.debug(f"Removing member from points table:{member_id} in {guild_id}")
-            self.delete(query,
-                        (str(guild_id), str(member_id)))
+            await self.delete(query,
+                              (int(member_id), int(guild_id)))
+            self.leaderboard.remove(guild_id, member_id)
+            await self.notifier.publish("members", guild_id=int(guild_id), member_id=int(member_id))
         except Exception as e:
             logger.warning(f"Failed to remove member from points table: '{member_id}' in Guild ID: '{guild_id}'."
                            f" Error: {e}")
@@ -867,201 +1100,339 @@ class DB:
 
     """
 
-    def sync(self, guilds=True, channels=True, members=True, roles=True, settings=True):
+    @staticmethod
+    def get_migrations():
+        """
+        Lists the migration files in db/migrations.
+        Migration files are named NNNN_description.sql and applied in order of their number.
+
+        :return: list - sorted (version, name, path) tuples
+        """
+        migrations = []
+        for file in os.listdir(MIGRATIONS_DIR):
+            if file.endswith(".sql") and file[:4].isdigit():
+                migrations.append((int(file[:4]), file[5:-4], os.path.join(MIGRATIONS_DIR, file)))
+        return sorted(migrations)
+
+    async def migrate(self):
+        """
+        Applies all pending migrations to the database.
+        Applied versions are tracked in the schema_migrations table,
+        and every migration runs in its own transaction.
+
+        :return: list - the versions that were applied
+        """
+        applied_now = []
+        async with self.pool.connection() as connection:
+            await connection.set_autocommit(True)
+            try:
+                await connection.execute("""
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version INT PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            applied_at TIMESTAMP NOT NULL DEFAULT now()
+                        )""")
+                await connection.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+                try:
+                    cursor = await connection.execute("SELECT version FROM schema_migrations")
+                    applied = {version for (version,) in await cursor.fetchall()}
+
+                    for version, name, path in self.get_migrations():
+                        if version in applied:
+                            continue
+                        logger.info(f"Applying migration {version:04d}_{name}...")
+                        with open(path) as file:
+                            migration = file.read()
+                        async with connection.transaction():
+                            await connection.execute(migration)
+                            await connection.execute(
+                                "INSERT INTO schema_migrations (version, name) VALUES ((%s), (%s))"
+                                , (version, name))
+                        applied_now.append(version)
+                finally:
+                    await connection.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+            finally:
+                await connection.set_autocommit(False)
+
+        logger.info(f"Database schema is up to date. Applied {len(applied_now)} migration(s).")
+        return applied_now
+
+    async def sync(self, guilds=True, channels=True, members=True, roles=True, settings=True, incremental=True):
         """
         Allows us to sync the database with all discord server information.
         This can be a new server, or an existing server in the DB.
 
+        Every entity type is written in bulk with upsert_many,
+        new rows are added and existing rows are updated in the same statement.
+        Each row carries a fingerprint of its fields in sync_hash. In incremental mode,
+        rows whose fingerprint did not change are skipped instead of being rewritten.
+        Channels, roles and members that no longer exist in a guild are deleted,
+        and so are the guilds the bot left, with everything that references them.
+
         :param guilds: boolean indicating if we want to sync guilds
         :param channels: boolean indicating if we want to sync channels
         :param members: boolean indicating if we want to sync member information
         :param roles: boolean indicating if we want to sync role information
         :param settings: boolean indicating if we want to sync settings information
+        :param incremental: boolean indicating if unchanged rows should be skipped
+        :return: dict - entity type -> counts of inserted, updated, deleted and skipped rows
         """
+        fingerprint_column = "sync_hash" if incremental else None
+        report = {}
 
-        def sync_guild_info():
+        def with_fingerprint(*fields):
+            """
+            Appends the fingerprint of the fields, and the sync time, to a row.
+            """
+            return (*fields, fingerprint(fields), datetime.now())
+
+        async def member_pages(guild):
+            """
+            Yields the members of a guild in pages of DB_SYNC_BATCH_SIZE.
+            Guilds without a complete member cache (MEMBER_MODE=lazy) are streamed from the API,
+            so their members are never all held in memory.
+            """
+            page_size = int(os.getenv("DB_SYNC_BATCH_SIZE", 5000))
+            if guild.chunked:
+                members = guild.members
+                for i in range(0, len(members), page_size):
+                    yield members[i:i + page_size]
+                return
+
+            page = []
+            async for member in guild.fetch_members(limit=None):
+                page.append(member)
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+        async def sync_guild_info():
             """
             Syncs all guild information in the database.
             If the guild is not in the database, it will be added.
             If the guild is in the database, it will be updated.
+            If the bot is no longer in the guild, it will be deleted.
 
             """
-            logger.info("Starting database sync...")
-
-            for guild in self.discord_client.guilds:
-                logger.info("Syncing guild...")
-                if self.is_guild_in_db(guild.id) is None:
-                    self.add_guild_to_guilds_table(
-                        guild.name
-                        , str(guild.icon)
-                        , guild.created_at
-                        , guild.member_count
-                        , guild.nsfw_level[0]
-                        , guild.preferred_locale[1]
-                        , guild.id
-                        , False
-                        , False
-                        , datetime.now()
-                    )
-                else:
-                    self.update_guild_info(
-                        guild.name
-                        , str(guild.icon)
-                        , guild.created_at
-                        , guild.member_count
-                        , guild.nsfw_level[0]
-                        , guild.preferred_locale[1]
-                        , datetime.now()
-                        , guild.id
-                    )
+            logger.info("Syncing guilds...")
+            rows = (
+                with_fingerprint(
+                    guild.id
+                    , guild.name
+                    , str(guild.icon)
+                    , guild.member_count
+                    , guild.nsfw_level[0]
+                    , guild.preferred_locale[1]
+                    , False
+                    , False
+                    , guild.created_at)
+                for guild in self.discord_client.guilds
+            )
+            report["guilds"] = await self.upsert_many(
+                "guilds"
+                , ("discord_guild_id", "name", "logo", "member_count", "nsfw_level"
+                   , "language", "is_premium", "is_test", "created_at", "sync_hash", "last_sync")
+                , ("discord_guild_id",)
+                , rows
+                , update_columns=("name", "logo", "member_count", "nsfw_level"
+                                  , "language", "created_at", "sync_hash", "last_sync")
+                , fingerprint_column=fingerprint_column
+            )
 
-        def sync_channel_info():
+            # Deleted one by one, so the caches of each guild are invalidated, here and in the other processes.
+            # An empty guild list means the bot is not connected yet, not that it left every guild.
+            present = [guild.id for guild in self.discord_client.guilds]
+            left = await self.select_all(
+                "SELECT discord_guild_id FROM guilds WHERE NOT (discord_guild_id = ANY(%s))", present
+            ) if present else []
+            for (guild_id,) in left:
+                await self.delete_guild(guild_id)
+            report["guilds"]["deleted"] = len(left)
+
+        async def sync_channel_info():
             """
             Syncs all channel information in the database.
             If the channel does not exist in the database, it will be added.
             If the channel exists in the database, it will be updated.
+            If the channel no longer exists in discord, it will be deleted.
 
             """
-            for guild in self.discord_client.guilds:
-                logger.info("Syncing channel...")
-                for channel in guild.channels:
-                    if self.is_channel_in_db(channel.id) is None:
-                        self.add_channel_to_channel_table(
-                            channel.guild.id
-                            , channel.id
-                            , channel.name
-                            , 'Category' if channel.category is None else str(channel.category)
-                            , channel.position
-                            , channel.mention
-                            , channel.jump_url
-                            , channel.permissions_synced
-                            , str(channel.overwrites)
-                            , channel.created_at
-                            , datetime.now()
-                        )
-                    else:
-                        self.update_channel_in_db(
-                            channel.guild.id
-                            , channel.id
-                            , channel.name
-                            , 'Category' if channel.category is None else str(channel.category)
-                            , channel.position
-                            , channel.mention
-                            , channel.jump_url
-                            , channel.permissions_synced
-                            , str(channel.overwrites)
-                            , channel.created_at
-                            , datetime.now()
-                        )
-
-        def sync_role_info():
+            logger.info("Syncing channels...")
+            rows = (
+                with_fingerprint(
+                    channel.guild.id
+                    , channel.id
+                    , channel.name
+                    , 'Category' if channel.category is None else str(channel.category)
+                    , channel.position
+                    , channel.mention
+                    , channel.jump_url
+                    , channel.permissions_synced
+                    , str(channel.overwrites)
+                    , channel.created_at)
+                for guild in self.discord_client.guilds
+                for channel in guild.channels
+            )
+            report["channels"] = await self.upsert_many(
+                "channels"
+                , ("discord_guild_id", "channel_id", "channel_name", "category", "position", "mention"
+                   , "jump_url", "permissions_synced", "overwrites", "created_at", "sync_hash", "last_synced")
+                , ("channel_id",)
+                , rows
+                , fingerprint_column=fingerprint_column
+            )
+            report["channels"]["deleted"] = await self.delete_missing(
+                "channels"
+                , "discord_guild_id"
+                , "channel_id"
+                , {guild.id: [channel.id for channel in guild.channels]
+                   for guild in self.discord_client.guilds}
+            )
+
+        async def sync_role_info():
             """
             Syncs all role information in the database.
             If the role does not exist in the database, it will be added.
             If the role exists in the database, it will be updated.
+            If the role no longer exists in discord, it will be deleted.
 
             """
-            for guild in self.discord_client.guilds:
-                logger.info("Syncing roles...")
-                for role in guild.roles:
-                    if self.is_role_in_db(role.id) is None:
-                        self.add_role_to_roles_table(
-                            str(role.guild.id)
-                            , str(role.id)
-                            , role.name
-                            , role.position
-                            , str(role.color)
-                            , role.hoist
-                            , role.mentionable
-                            , role.managed
-                            , str(role.permissions)
-                            , role.created_at
-                            , datetime.now()
-                        )
-                    else:
-                        self.update_role_in_db(
-                            str(role.guild.id)
-                            , str(role.id)
-                            , role.name
-                            , role.position
-                            , str(role.color)
-                            , role.hoist
-                            , role.mentionable
-                            , role.managed
-                            , str(role.permissions)
-                            , role.created_at
-                            , datetime.now()
-                        )
-
-        def sync_member_info():
+            logger.info("Syncing roles...")
+            rows = (
+                with_fingerprint(
+                    role.guild.id
+                    , role.id
+                    , role.name
+                    , role.position
+                    , str(role.color)
+                    , role.hoist
+                    , role.mentionable
+                    , role.managed
+                    , str(role.permissions)
+                    , role.created_at)
+                for guild in self.discord_client.guilds
+                for role in guild.roles
+            )
+            report["roles"] = await self.upsert_many(
+                "roles"
+                , ("discord_guild_id", "role_id", "name", "position", "color", "hoisted"
+                   , "mentionable", "managed", "permissions", "created_at", "sync_hash", "last_synced")
+                , ("role_id",)
+                , rows
+                , fingerprint_column=fingerprint_column
+            )
+            report["roles"]["deleted"] = await self.delete_missing(
+                "roles"
+                , "discord_guild_id"
+                , "role_id"
+                , {guild.id: [role.id for role in guild.roles]
+                   for guild in self.discord_client.guilds}
+            )
+
+        async def sync_member_info():
             """
             Syncs all member information in the database.
             If the member does not exist in the database, it will be added.
             If the member exists in the database, it will be updated.
+            If the member is no longer in the guild, it will be deleted.
 
             """
+            logger.info("Syncing members...")
+            report["members"] = {"inserted": 0, "updated": 0, "skipped": 0}
+            present_members = {}
             for guild in self.discord_client.guilds:
-                logger.info("Syncing members...")
-                for member in guild.members:
-                    if self.is_member_in_db(member.id) is None:
-                        self.add_member_to_members_table(
-                            member.guild.id
+                present_members[guild.id] = []
+                async for page in member_pages(guild):
+                    rows = (
+                        with_fingerprint(
+                            guild.id
                             , member.id
                             , member.name
                             , str(member.avatar)
                             , member.nick
                             , member.display_name
-                            , member.top_role
-                            , member.created_at
+                            , str(member.top_role)
                             , member.joined_at
-                            , datetime.now()
-                        )
-                    else:
-                        self.update_member_info(
-                            member.guild.id
-                            , member.id
-                            , member.name
-                            , str(member.avatar)
-                            , member.created_at
-                            , member.nick
-                            , member.display_name
-                            , member.joined_at
-                        )
+                            , member.created_at)
+                        for member in page
+                    )
+                    page_report = await self.upsert_many(
+                        "members"
+                        , ("discord_guild_id", "discord_member_id", "name", "avatar", "nickname"
+                           , "display_name", "top_role", "joined_at", "created_at", "sync_hash", "last_sync")
+                        , ("discord_guild_id", "discord_member_id")
+                        , rows
+                        , fingerprint_column=fingerprint_column
+                    )
+                    for key, count in page_report.items():
+                        report["members"][key] += count
+                    present_members[guild.id] += [member.id for member in page]
+
+            report["members"]["deleted"] = await self.delete_missing(
+                "members"
+                , "discord_guild_id"
+                , "discord_member_id"
+                , present_members
+            )
+            self.member_cache.invalidate()
+            if report["members"]["deleted"]:
+                # Deleted members take their points with them.
+                self.leaderboard.invalidate()
+            await self.notifier.publish("members", guild_id=None)
 
-        def sync_settings_info():
+        async def sync_settings_info():
             """
             Created an entry in the settings table for a new guild.
             Existing guilds are not modified
 
             """
-            for guild in self.discord_client.guilds:
-                logger.info("Adding settings...")
-                if not self.is_settings_in_db(guild.id):
-                    self.add_settings_to_bot_settings_table(
-                        guild.id
-                        , self.discord_client.user.id
-                        , True
-                        , True
-                        , True
-                        , True
-                        , True
-                        , datetime.now()
-                    )
+            logger.info("Adding settings...")
+            rows = (
+                (guild.id
+                 , self.discord_client.user.id
+                 , True
+                 , True
+                 , True
+                 , True
+                 , True
+                 , datetime.now())
+                for guild in self.discord_client.guilds
+            )
+            report["settings"] = await self.upsert_many(
+                "bot_settings"
+                , ("discord_guild_id", "discord_bot_id", "admin", "logging"
+                   , "moderation", "antispam", "fun", "last_sync")
+                , ("discord_guild_id",)
+                , rows
+                , update_columns=()
+            )
+            self.settings.invalidate()
+            await self.notifier.publish("settings", guild_id=None)
+
+        logger.info("Starting database sync...")
 
         if guilds:
-            sync_guild_info()
+            await sync_guild_info()
 
         if channels:
-            sync_channel_info()
+            await sync_channel_info()
 
         if roles:
-            sync_role_info()
+            await sync_role_info()
 
         if members:
-            sync_member_info()
+            await sync_member_info()
 
         if settings:
-            sync_settings_info()
+            await sync_settings_info()
+
+        for entity, counts in report.items():
+            counts.setdefault("deleted", 0)
+            logger.info(f"Synced {entity}: {counts}")
+        logger.info("Database sync complete.")
+        return report
 
     """
     5th layer.
@@ -1070,68 +1441,413 @@ class DB:
     """
 
     # POINTS
-    def get_points(self, member):
-        select_query = """
-                        SELECT
-                            points 
-                        FROM
-                            points
-                        WHERE
-                            discord_member_id = (%s)
-                        """
-        return self.select_one(select_query, member.id)
+    async def get_points(self, guild_id, member_id):
+        """
+        Returns the points of a member in a guild.
 
-    def add_points(self, member, amount):
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :return: int - the points of the member, 0 if they have none yet
+        """
         select_query = """
                         SELECT
                             points 
                         FROM
                             points
                         WHERE
-                            discord_member_id = (%s)
-                        """
-        update_query = """UPDATE 
-                            points
-                        SET
-                            points = (%s)
-                        WHERE discord_member_id = (%s)
+                            discord_guild_id = (%s)
+                            AND discord_member_id = (%s)
                         """
+        row = await self.select_one(select_query, int(guild_id), int(member_id))
+        return row[0] if row else 0
+
+    async def add_points(self, guild_id, member_id, amount):
+        """
+        Adds points to a member in a single statement, creating their row if it is missing.
+        The increment happens in the database, so concurrent updates are never lost.
+
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :param amount: The amount of points to add, negative to remove
+        :return: int - the new points of the member, None if the update failed
+        """
+        query = f"""
+                WITH {KNOWN_MEMBERS_CTE}
+                INSERT INTO
+                    points (discord_guild_id, discord_member_id, points)
+                VALUES((%s), (%s), (%s))
+                ON CONFLICT (discord_guild_id, discord_member_id)
+                DO UPDATE SET
+                    points = points.points + EXCLUDED.points
+                RETURNING
+                    points
+                """
         try:
-            current_points = self.select_one(select_query, member.id)
-            new_points = current_points + amount
+            logger.debug(f"Adding {amount} points to {member_id} in guild: {guild_id}")
+            row = await self.select_one(query, [int(guild_id)], [int(guild_id)], [int(member_id)]
+                                        , int(guild_id), int(member_id), amount)
+            self.leaderboard.apply([(int(guild_id), int(member_id), row[0])])
+            await self.notifier.publish("points", totals=[(int(guild_id), int(member_id), row[0])])
+            return row[0]
 
-            logger.debug(f"Adding {new_points} to {member.name} in guild: {member.guild.id}")
-            self.update(update_query, (new_points, member.id))
+        except Exception as e:
+            logger.warning(f"Failed to add points for: {member_id} in guild: {guild_id}. Error: {e}")
+
+    async def remove_points(self, guild_id, member_id, amount):
+        """
+        Removes points from a member, see add_points.
+
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :param amount: The amount of points to remove
+        :return: int - the new points of the member, None if the update failed
+        """
+        return await self.add_points(guild_id, member_id, -amount)
+
+    async def apply_point_deltas(self, deltas):
+        """
+        Applies many point changes in a single statement.
+        Deltas for the same member are summed up before they are applied.
+
+        :param deltas: An iterable of (guild_id, member_id, amount) tuples
+        :return: list - (guild_id, member_id, points) tuples with the new points of every member touched
+        """
+        query = f"""
+                WITH {KNOWN_MEMBERS_CTE}
+                INSERT INTO
+                    points (discord_guild_id, discord_member_id, points)
+                SELECT
+                    guild_id, member_id, SUM(amount)
+                FROM
+                    unnest((%s)::BIGINT[], (%s)::BIGINT[], (%s)::INT[]) AS deltas (guild_id, member_id, amount)
+                GROUP BY
+                    guild_id, member_id
+                ON CONFLICT (discord_guild_id, discord_member_id)
+                DO UPDATE SET
+                    points = points.points + EXCLUDED.points
+                RETURNING
+                    discord_guild_id, discord_member_id, points
+                """
+        guild_ids, member_ids, amounts = [], [], []
+        for guild_id, member_id, amount in deltas:
+            guild_ids.append(int(guild_id))
+            member_ids.append(int(member_id))
+            amounts.append(amount)
+
+        if not amounts:
+            return []
+        logger.debug(f"Applying {len(amounts)} point deltas")
+        totals = await self.select_all(query, guild_ids, guild_ids, member_ids, guild_ids, member_ids, amounts)
+        self.leaderboard.apply(totals)
+        await self.notifier.publish("points", totals=totals)
+        return totals
+
+    async def apply_point_awards(self, awards):
+        """
+        Records the points awarded per message in the point ledger,
+        and adds them to the points of their members, in a single statement.
+        Messages that are already in the ledger are not counted twice.
+
+        :param awards: An iterable of (message_id, guild_id, member_id, amount) tuples
+        :return: list - (guild_id, member_id, points) tuples with the new points of every member touched
+        """
+        query = f"""
+                WITH {KNOWN_MEMBERS_CTE}, ledger AS (
+                    INSERT INTO
+                        point_ledger (message_id, discord_guild_id, discord_member_id, points)
+                    SELECT
+                        *
+                    FROM
+                        unnest((%s)::BIGINT[], (%s)::BIGINT[], (%s)::BIGINT[], (%s)::INT[])
+                    ON CONFLICT (message_id) DO NOTHING
+                    RETURNING
+                        discord_guild_id, discord_member_id, points
+                )
+                INSERT INTO
+                    points (discord_guild_id, discord_member_id, points)
+                SELECT
+                    discord_guild_id, discord_member_id, SUM(points)
+                FROM
+                    ledger
+                GROUP BY
+                    discord_guild_id, discord_member_id
+                ON CONFLICT (discord_guild_id, discord_member_id)
+                DO UPDATE SET
+                    points = points.points + EXCLUDED.points
+                RETURNING
+                    discord_guild_id, discord_member_id, points
+                """
+        message_ids, guild_ids, member_ids, amounts = [], [], [], []
+        for message_id, guild_id, member_id, amount in awards:
+            message_ids.append(int(message_id))
+            guild_ids.append(int(guild_id))
+            member_ids.append(int(member_id))
+            amounts.append(amount)
+
+        if not message_ids:
+            return []
+        logger.debug(f"Recording points for {len(message_ids)} messages")
+        totals = await self.select_all(query, guild_ids, guild_ids, member_ids
+                                       , message_ids, guild_ids, member_ids, amounts)
+        self.leaderboard.apply(totals)
+        await self.notifier.publish("points", totals=totals)
+        return totals
+
+    async def revert_point_awards(self, message_ids):
+        """
+        Takes back the points awarded for deleted messages, in a single statement.
+        Messages that are not in the ledger (never awarded, or already rolled up) are ignored.
+
+        :param message_ids: An iterable of message IDs
+        :return: list - (guild_id, member_id, points) tuples with the new points of every member touched
+        """
+        query = """
+                WITH removed AS (
+                    DELETE FROM
+                        point_ledger
+                    WHERE
+                        message_id = ANY((%s)::BIGINT[])
+                    RETURNING
+                        discord_guild_id, discord_member_id, points
+                ), totals AS (
+                    SELECT
+                        discord_guild_id, discord_member_id, SUM(points) AS points
+                    FROM
+                        removed
+                    GROUP BY
+                        discord_guild_id, discord_member_id
+                )
+                UPDATE
+                    points
+                SET
+                    points = points.points - totals.points
+                FROM
+                    totals
+                WHERE
+                    points.discord_guild_id = totals.discord_guild_id
+                    AND points.discord_member_id = totals.discord_member_id
+                RETURNING
+                    points.discord_guild_id, points.discord_member_id, points.points
+                """
+        message_ids = [int(message_id) for message_id in message_ids]
+        if not message_ids:
+            return []
+        logger.debug(f"Reverting points for {len(message_ids)} deleted messages")
+        totals = await self.select_all(query, message_ids)
+        self.leaderboard.apply(totals)
+        await self.notifier.publish("points", totals=totals)
+        return totals
+
+    async def rollup_point_ledger(self, retention_days=None):
+        """
+        Keeps the point ledger small by dropping the entries older than the retention window.
+        Their points were added to the points table when they were recorded,
+        the only thing lost is the ability to take them back if the message is deleted.
+
+        :param retention_days: Days to keep ledger entries for, defaults to POINTS_LEDGER_RETENTION_DAYS
+        :return: int - the number of entries rolled up
+        """
+        retention_days = retention_days or int(os.getenv("POINTS_LEDGER_RETENTION_DAYS", 30))
+        query = """
+                DELETE FROM
+                    point_ledger
+                WHERE
+                    created_at < now() - make_interval(days => (%s))
+                """
+        async with self.pool.connection() as connection:
+            cursor = await connection.execute(query, (retention_days,))
+            logger.debug(f"Rolled up {cursor.rowcount} point ledger entries")
+            return cursor.rowcount
+
+
+    # LEADERBOARD
+    async def get_guild_points(self, guild_id):
+        """
+        Returns the points of every member of a guild, used to build its leaderboard.
+
+        :param guild_id: The ID of the Guild
+        :return: list - (member_id, points) tuples
+        """
+        query = """
+                SELECT
+                    discord_member_id, points
+                FROM
+                    points
+                WHERE
+                    discord_guild_id = (%s)
+                """
+        return await self.select_all(query, int(guild_id))
+
+    async def get_leaderboard(self, guild_id, limit=10):
+        """
+        Returns the members with the most points in a guild, from the cached ranking.
+
+        :param guild_id: The ID of the Guild
+        :param limit: The number of members to return
+        :return: list - (member_id, points) tuples, most points first
+        """
+        ranking = await self.leaderboard.get_guild(guild_id)
+        return ranking.top(limit)
 
+    async def get_rank(self, guild_id, member_id):
+        """
+        Returns the rank of a member in their guild, from the cached ranking.
+
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :return: tuple - (rank, points), or (None, 0) if the member has no points yet
+        """
+        ranking = await self.leaderboard.get_guild(guild_id)
+        member_id = int(member_id)
+        return ranking.rank(member_id), ranking.points.get(member_id, 0)
+
+
+    # MEMBERS
+    async def get_member(self, guild_id, member_id):
+        """
+        Returns a member as stored in the members table, through the member cache.
+        Used when the discord.py member cache does not hold the member, see MEMBER_MODE.
+
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :return: StoredMember, None if the member is not in the database
+        """
+        try:
+            return await self.member_cache.get(guild_id, member_id)
         except Exception as e:
-            logger.warning(f"Failed to add points for: {member.name} in guild: {member.guild.id}. Error: {e}")
+            logger.warning(f"Failed to get member: {member_id} in guild: {guild_id}. Error: {e}")
 
-    def remove_points(self, member, amount):
-        select_query = """
-                        SELECT
-                            points 
-                        FROM
-                            points
-                        WHERE
-                            discord_member_id = (%s)
-                        """
-        update_query = """
-                        UPDATE 
-                            points
-                        SET
-                            points = (%s)
-                        WHERE
-                            discord_member_id = (%s)
-                        """
+    # TICKETS
+    async def add_ticket(self, ticket):
+        """
+        Records a new ticket thread.
+
+        :param ticket: Ticket - from the ticket registry
+        """
+        query = """
+                INSERT INTO
+                    tickets (thread_id, discord_guild_id, parent_channel_id, owner_id, name, status, created_at)
+                VALUES((%s), (%s), (%s), (%s), (%s), (%s), (%s))
+                ON CONFLICT (thread_id) DO NOTHING
+                """
+        try:
+            logger.debug(f"Adding ticket: {ticket.thread_id} in guild: {ticket.guild_id}")
+            await self.insert(query, (ticket.thread_id, ticket.guild_id, ticket.parent_id, ticket.owner_id
+                                      , ticket.name, ticket.status, ticket.created_at))
+            await self.publish_ticket(ticket)
+        except Exception as e:
+            logger.warning(f"Failed to add ticket: {ticket.thread_id} in guild: {ticket.guild_id}. Error: {e}")
+
+    async def update_ticket_status(self, ticket):
+        """
+        Opens or closes a ticket.
+
+        :param ticket: Ticket - from the ticket registry, with its new status
+        """
+        query = """
+                UPDATE
+                    tickets
+                SET
+                    status = (%s)
+                    , closed_at = CASE WHEN (%s) = 'closed' THEN now() END
+                WHERE
+                    thread_id = (%s)
+                """
         try:
-            current_points = self.select_one(select_query, member.id)
-            new_points = current_points - amount
+            logger.debug(f"Setting ticket: {ticket.thread_id} to {ticket.status}")
+            await self.update(query, (ticket.status, ticket.status, ticket.thread_id))
+            await self.publish_ticket(ticket)
+        except Exception as e:
+            logger.warning(f"Failed to set ticket: {ticket.thread_id} to {ticket.status}. Error: {e}")
 
-            logger.debug(f"Removing {new_points} to {member.name} in guild: {member.guild.id}")
-            self.update(update_query, (new_points, member.id))
+    async def publish_ticket(self, ticket):
+        """
+        Tells the other processes about a ticket write, see db.notify.
+        """
+        await self.notifier.publish(
+            "tickets", thread_id=ticket.thread_id, guild_id=ticket.guild_id, parent_id=ticket.parent_id
+            , owner_id=ticket.owner_id, name=ticket.name, status=ticket.status
+        )
 
+    async def get_open_tickets(self, guild_id):
+        """
+        Returns the open tickets of a guild, from the ticket registry.
+
+        :param guild_id: The ID of the Guild
+        :return: list - Ticket objects, oldest first
+        """
+        return self.tickets.open_tickets(guild_id)
+
+    # SETTINGS
+    async def get_log_channel(self, guild_id, log_type):
+        """
+        Returns the channel a guild sends a type of log to, from the settings cache.
+
+        :param guild_id: The ID of the Guild
+        :param log_type: One of join_log, chat_log, moderation_log, server_log
+        :return: int - the ID of the log channel, None if the guild has not set one
+        """
+        settings = await self.settings.get(guild_id)
+        return settings.log_channels.get(log_type)
+
+    async def is_feature_enabled(self, guild_id, feature):
+        """
+        Checks if a feature is turned on for a guild, from the settings cache.
+        Guilds without settings have every feature turned on, like new guilds get on sync.
+
+        :param guild_id: The ID of the Guild
+        :param feature: One of admin, moderation, logging, antispam, fun
+        :return: boolean - if the feature is enabled
+        """
+        settings = await self.settings.get(guild_id)
+        return settings.features.get(feature, True)
+
+    async def set_log_channel(self, guild_id, channel_id, log_type):
+        """
+        Makes a channel the log channel of a guild for one type of log.
+        The log type is turned off on every other channel of the guild.
+
+        :param guild_id: The ID of the Guild
+        :param channel_id: The ID of the Channel
+        :param log_type: One of join_log, chat_log, moderation_log, server_log
+        """
+        if log_type not in LOG_TYPES:
+            raise ValueError(f"Unknown log type: {log_type}")
+
+        upsert_query = f"""
+                WITH {KNOWN_GUILDS_CTE}, known_channels AS (
+                    INSERT INTO
+                        channels (discord_guild_id, channel_id)
+                    VALUES((%s), (%s))
+                    ON CONFLICT (channel_id) DO NOTHING
+                )
+                INSERT INTO
+                    channel_settings (discord_guild_id, channel_id, {log_type})
+                VALUES((%s), (%s), TRUE)
+                ON CONFLICT (channel_id)
+                DO UPDATE SET
+                    {log_type} = TRUE
+                """
+        clear_query = f"""
+                UPDATE
+                    channel_settings
+                SET
+                    {log_type} = FALSE
+                WHERE
+                    discord_guild_id = (%s)
+                    AND channel_id <> (%s)
+                """
+        try:
+            logger.debug(f"Setting {log_type} of guild: {guild_id} to channel: {channel_id}")
+            async with self.pool.connection() as connection:
+                await connection.execute(upsert_query, ([int(guild_id)], int(guild_id), int(channel_id)
+                                                        , int(guild_id), int(channel_id)))
+                await connection.execute(clear_query, (int(guild_id), int(channel_id)))
         except Exception as e:
-            logger.warning(f"Failed to remove points for: {member.name} in guild: {member.guild.id}. Error: {e}")
+            logger.warning(f"Failed to set {log_type} of guild: {guild_id} to channel: {channel_id}. Error: {e}")
+        finally:
+            self.settings.invalidate(guild_id)
+            await self.notifier.publish("settings", guild_id=int(guild_id))
 
 
 def init_db(bot: Bot):
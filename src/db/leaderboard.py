@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+
+class GuildRanking:
+    """
+    The points of every member of one guild, kept sorted from most to least points.
+    Entries are (-points, member_id) tuples, so ties are broken by member ID.
+    """
+
+    def __init__(self, rows=()):
+        """
+        :param rows: An iterable of (member_id, points) tuples
+        """
+        self.points = dict(rows)
+        self.ranking = sorted((-points, member_id) for member_id, points in self.points.items())
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def update(self, member_id, points):
+        """
+        Moves a member to their new place in the ranking.
+        """
+        self.remove(member_id)
+        self.points[member_id] = points
+        insort(self.ranking, (-points, member_id))
+
+    def remove(self, member_id):
+        """
+        Takes a member out of the ranking.
+        """
+        old_points = self.points.pop(member_id, None)
+        if old_points is not None:
+            del self.ranking[bisect_left(self.ranking, (-old_points, member_id))]
+
+    def top(self, limit):
+        """
+        :return: list - (member_id, points) tuples of the members with the most points
+        """
+        return [(member_id, -points) for points, member_id in self.ranking[:limit]]
+
+    def rank(self, member_id):
+        """
+        Members with the same points share the same rank.
+
+        :return: int - the rank of the member, starting at 1. None if they have no points entry.
+        """
+        points = self.points.get(member_id)
+        if points is None:
+            return None
+        return bisect_left(self.ranking, (-points,)) + 1
+
+
+class Leaderboard:
+    """
+    In-memory per-guild point rankings, backed by the points table.
+
+    A guild is loaded with a single query the first time it is asked for,
+    then kept up to date from the new totals every points write returns.
+    Changes that arrive while a guild is loading are replayed on the loaded ranking,
+    the query may have run before them. A guild invalidated while loading is not kept.
+    """
+
+    def __init__(self, db):
+        """
+        :param db: The DB object used to load the rankings
+        """
+        self.db = db
+        self.guilds = {}
+        self._loading = {}
+        self._pending = {}
+
+    async def get_guild(self, guild_id):
+        """
+        Returns the ranking of a guild, loading it from the database if needed.
+
+        :param guild_id: The ID of the Guild
+        :return: GuildRanking
+        """
+        guild_id = int(guild_id)
+        if guild_id in self.guilds:
+            return self.guilds[guild_id]
+
+        # Concurrent callers share a single load.
+        if guild_id not in self._loading:
+            self._pending[guild_id] = []
+            self._loading[guild_id] = asyncio.ensure_future(self._load(guild_id))
+        return await asyncio.shield(self._loading[guild_id])
+
+    def apply(self, totals):
+        """
+        Updates the loaded rankings with new point totals.
+        Guilds that are not loaded are skipped, they will be read fresh when asked for.
+
+        :param totals: An iterable of (guild_id, member_id, points) tuples
+        """
+        for guild_id, member_id, points in totals:
+            self._change(int(guild_id), int(member_id), points)
+
+    def remove(self, guild_id, member_id):
+        """
+        Takes a member out of their guild's ranking.
+        """
+        self._change(int(guild_id), int(member_id), None)
+
+    def invalidate(self, guild_id=None):
+        """
+        Drops the cached ranking of a guild, or of every guild.
+        """
+        if guild_id is None:
+            self.guilds.clear()
+            for pending in self._pending.values():
+                pending.append(None)
+        else:
+            self.guilds.pop(int(guild_id), None)
+            if int(guild_id) in self._pending:
+                self._pending[int(guild_id)].append(None)
+
+    def _change(self, guild_id, member_id, points):
+        """
+        Applies new points to a loaded ranking, or queues them while the guild loads. None removes the member.
+        """
+        ranking = self.guilds.get(guild_id)
+        if ranking is not None:
+            if points is None:
+                ranking.remove(member_id)
+            else:
+                ranking.update(member_id, points)
+        elif guild_id in self._pending:
+            self._pending[guild_id].append((member_id, points))
+
+    async def _load(self, guild_id):
+        try:
+            rows = await self.db.get_guild_points(guild_id)
+            ranking = GuildRanking(rows)
+            pending = self._pending[guild_id]
+            for change in pending:
+                if change is None:  # Invalidated while loading
+                    break
+                member_id, points = change
+                if points is None:
+                    ranking.remove(member_id)
+                else:
+                    ranking.update(member_id, points)
+            else:
+                self.guilds[guild_id] = ranking
+            logger.debug(f"Loaded the leaderboard of guild {guild_id}: {len(ranking)} members")
+            return ranking
+        finally:
+            del self._loading[guild_id]
+            del self._pending[guild_id]
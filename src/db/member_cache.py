@@ -0,0 +1,104 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+StoredMember = namedtuple(
+    "StoredMember", "id guild_id name avatar nickname display_name top_role joined_at created_at"
+)
+
+MEMBER_QUERY = """
+                SELECT
+                    discord_member_id, discord_guild_id, name, NULLIF(avatar, 'None'), nickname
+                    , display_name, top_role, joined_at, created_at
+                FROM
+                    members
+                WHERE
+                    discord_guild_id = (%s)
+                    AND discord_member_id = (%s)
+                    AND name IS NOT NULL  -- Placeholders added by the point writes, see db.database
+                """
+
+
+class MemberCache:
+    """
+    Async LRU of members, backed by the members table.
+
+    Used in place of the discord.py member cache when it is turned off (MEMBER_MODE=lazy):
+    at most MEMBER_CACHE_SIZE members are kept in memory, the others are read from the
+    database on their next lookup. Members that are not in the table, or only as a placeholder,
+    are cached too, as None.
+    """
+
+    def __init__(self, db, size=None):
+        """
+        :param db: The DB object used to load the members
+        :param size: Number of members kept in memory
+        """
+        self.db = db
+        self.size = size or int(os.getenv("MEMBER_CACHE_SIZE", 10000))
+        self.members = OrderedDict()
+        self._loading = {}
+        self._invalidated = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, guild_id, member_id):
+        """
+        Returns a member, from memory if it is there.
+
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :return: StoredMember, None if the member is not in the database
+        """
+        key = (int(guild_id), int(member_id))
+        if key in self.members:
+            self.hits += 1
+            self.members.move_to_end(key)
+            return self.members[key]
+
+        self.misses += 1
+        # Concurrent callers share a single load.
+        if key not in self._loading:
+            self._loading[key] = asyncio.ensure_future(self._load(key))
+        return await asyncio.shield(self._loading[key])
+
+    def invalidate(self, guild_id=None, member_id=None):
+        """
+        Drops a cached member, every member of a guild, or every member.
+        """
+        if guild_id is None:
+            self.members.clear()
+        elif member_id is None:
+            for key in [key for key in self.members if key[0] == int(guild_id)]:
+                del self.members[key]
+        else:
+            self.members.pop((int(guild_id), int(member_id)), None)
+
+        # A load in flight may have read the row before the change, its result is not kept.
+        self._invalidated.update(
+            key for key in self._loading
+            if guild_id is None or (key[0] == int(guild_id) and (member_id is None or key[1] == int(member_id)))
+        )
+
+    def stats(self):
+        """
+        :return: dict - cached members, hits and misses
+        """
+        return {"members": len(self.members), "hits": self.hits, "misses": self.misses}
+
+    async def _load(self, key):
+        try:
+            row = await self.db.select_one(MEMBER_QUERY, *key)
+            member = StoredMember(*row) if row else None
+            if key not in self._invalidated:
+                self.members[key] = member
+                if len(self.members) > self.size:
+                    self.members.popitem(last=False)
+            return member
+        finally:
+            del self._loading[key]
+            self._invalidated.discard(key)
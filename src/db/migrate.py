@@ -0,0 +1,24 @@
+"""
+Applies all pending database migrations, then exits.
+The bot does this on its own at startup, this is for running them by hand.
+
+Run it from the src folder:
+    python -m db.migrate
+"""
+import asyncio
+import logging
+from db.database import DB
+
+
+async def main() -> None:
+    db = DB(None)
+    await db.open()
+    try:
+        await db.migrate()
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+----------------------------------------------------------------
+-- Unique keys used by the bulk upserts in DB.sync and the points table.
+-- Databases created from the current create_db.sql already have most of them,
+-- the index names match the constraint names so nothing is created twice.
+----------------------------------------------------------------
+
+-- Change detection columns, for databases created before they existed.
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS sync_hash BIGINT;
+ALTER TABLE members ADD COLUMN IF NOT EXISTS sync_hash BIGINT;
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS sync_hash BIGINT;
+ALTER TABLE roles ADD COLUMN IF NOT EXISTS sync_hash BIGINT;
+
+-- Drop duplicates that the old exists-check + insert could leave behind, keeping the newest row.
+DELETE FROM guilds a USING guilds b
+    WHERE a.id < b.id AND a.discord_guild_id = b.discord_guild_id;
+DELETE FROM channels a USING channels b
+    WHERE a.id < b.id AND a.channel_id = b.channel_id;
+DELETE FROM roles a USING roles b
+    WHERE a.id < b.id AND a.role_id = b.role_id;
+DELETE FROM members a USING members b
+    WHERE a.id < b.id
+      AND a.discord_guild_id = b.discord_guild_id
+      AND a.discord_member_id = b.discord_member_id;
+DELETE FROM bot_settings a USING bot_settings b
+    WHERE a.id < b.id AND a.discord_guild_id = b.discord_guild_id;
+
+-- Duplicate point rows are merged into the newest one, so nobody loses points.
+UPDATE points p
+    SET points = totals.points
+    FROM (
+        SELECT MAX(id) AS id, SUM(points) AS points
+        FROM points
+        GROUP BY discord_guild_id, discord_member_id
+        HAVING COUNT(*) > 1
+    ) totals
+    WHERE p.id = totals.id;
+DELETE FROM points a USING points b
+    WHERE a.id < b.id
+      AND a.discord_guild_id = b.discord_guild_id
+      AND a.discord_member_id = b.discord_member_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS guilds_discord_guild_id_key
+    ON guilds (discord_guild_id);
+CREATE UNIQUE INDEX IF NOT EXISTS channels_channel_id_key
+    ON channels (channel_id);
+CREATE UNIQUE INDEX IF NOT EXISTS roles_role_id_key
+    ON roles (role_id);
+CREATE UNIQUE INDEX IF NOT EXISTS members_discord_guild_id_discord_member_id_key
+    ON members (discord_guild_id, discord_member_id);
+CREATE UNIQUE INDEX IF NOT EXISTS bot_settings_discord_guild_id_key
+    ON bot_settings (discord_guild_id);
+CREATE UNIQUE INDEX IF NOT EXISTS points_discord_guild_id_discord_member_id_key
+    ON points (discord_guild_id, discord_member_id);
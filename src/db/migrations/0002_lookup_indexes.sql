@@ -0,0 +1,17 @@
+----------------------------------------------------------------
+-- Indexes for the columns every existence check, update and delete filters on.
+-- Lookups by (guild, member) on members and points use the unique keys from 0001.
+----------------------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS members_discord_member_id_idx
+    ON members (discord_member_id);
+CREATE INDEX IF NOT EXISTS channels_discord_guild_id_idx
+    ON channels (discord_guild_id);
+CREATE INDEX IF NOT EXISTS roles_discord_guild_id_idx
+    ON roles (discord_guild_id);
+CREATE INDEX IF NOT EXISTS channel_settings_discord_guild_id_idx
+    ON channel_settings (discord_guild_id);
+CREATE INDEX IF NOT EXISTS channel_settings_channel_id_idx
+    ON channel_settings (channel_id);
+CREATE INDEX IF NOT EXISTS moderation_discord_guild_id_discord_member_id_idx
+    ON moderation (discord_guild_id, discord_member_id);
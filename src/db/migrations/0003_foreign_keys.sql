@@ -0,0 +1,47 @@
+----------------------------------------------------------------
+-- Turn on the foreign keys that were commented out in create_db.sql.
+-- They are added NOT VALID: new writes are checked straight away,
+-- rows that already exist are not. Once they are clean, run
+-- ALTER TABLE <table> VALIDATE CONSTRAINT <constraint>;
+----------------------------------------------------------------
+
+ALTER TABLE members
+    ADD CONSTRAINT members_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channels
+    ADD CONSTRAINT channels_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE roles
+    ADD CONSTRAINT roles_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channel_settings
+    ADD CONSTRAINT channel_settings_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channel_settings
+    ADD CONSTRAINT channel_settings_channel_id_fkey
+    FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE points
+    ADD CONSTRAINT points_discord_guild_id_discord_member_id_fkey
+    FOREIGN KEY (discord_guild_id, discord_member_id) REFERENCES members (discord_guild_id, discord_member_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE bot_settings
+    ADD CONSTRAINT bot_settings_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+-- Moderation history has to outlive the member, so it only references the guild.
+ALTER TABLE moderation
+    ADD CONSTRAINT moderation_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
@@ -0,0 +1,87 @@
+----------------------------------------------------------------
+-- Store discord snowflakes as BIGINT instead of TEXT.
+-- A snowflake is a 64 bit integer, so it takes 8 bytes instead of ~20,
+-- which makes the keys and indexes on these columns a lot smaller.
+--
+-- The foreign keys are dropped while the columns change type, then added back.
+----------------------------------------------------------------
+
+ALTER TABLE members DROP CONSTRAINT IF EXISTS members_discord_guild_id_fkey;
+ALTER TABLE channels DROP CONSTRAINT IF EXISTS channels_discord_guild_id_fkey;
+ALTER TABLE roles DROP CONSTRAINT IF EXISTS roles_discord_guild_id_fkey;
+ALTER TABLE channel_settings DROP CONSTRAINT IF EXISTS channel_settings_discord_guild_id_fkey;
+ALTER TABLE channel_settings DROP CONSTRAINT IF EXISTS channel_settings_channel_id_fkey;
+ALTER TABLE points DROP CONSTRAINT IF EXISTS points_discord_guild_id_discord_member_id_fkey;
+ALTER TABLE bot_settings DROP CONSTRAINT IF EXISTS bot_settings_discord_guild_id_fkey;
+ALTER TABLE moderation DROP CONSTRAINT IF EXISTS moderation_discord_guild_id_fkey;
+
+ALTER TABLE guilds
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT;
+
+ALTER TABLE members
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN discord_member_id TYPE BIGINT USING NULLIF(discord_member_id, '')::BIGINT;
+
+ALTER TABLE channels
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN channel_id TYPE BIGINT USING NULLIF(channel_id, '')::BIGINT;
+
+ALTER TABLE channel_settings
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN channel_id TYPE BIGINT USING NULLIF(channel_id, '')::BIGINT;
+
+ALTER TABLE roles
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN role_id TYPE BIGINT USING NULLIF(role_id, '')::BIGINT;
+
+ALTER TABLE points
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN discord_member_id TYPE BIGINT USING NULLIF(discord_member_id, '')::BIGINT;
+
+ALTER TABLE bot_settings
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN discord_bot_id TYPE BIGINT USING NULLIF(discord_bot_id, '')::BIGINT;
+
+ALTER TABLE moderation
+    ALTER COLUMN discord_guild_id TYPE BIGINT USING NULLIF(discord_guild_id, '')::BIGINT,
+    ALTER COLUMN discord_member_id TYPE BIGINT USING NULLIF(discord_member_id, '')::BIGINT;
+
+ALTER TABLE members
+    ADD CONSTRAINT members_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channels
+    ADD CONSTRAINT channels_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE roles
+    ADD CONSTRAINT roles_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channel_settings
+    ADD CONSTRAINT channel_settings_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE channel_settings
+    ADD CONSTRAINT channel_settings_channel_id_fkey
+    FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE points
+    ADD CONSTRAINT points_discord_guild_id_discord_member_id_fkey
+    FOREIGN KEY (discord_guild_id, discord_member_id) REFERENCES members (discord_guild_id, discord_member_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE bot_settings
+    ADD CONSTRAINT bot_settings_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
+
+ALTER TABLE moderation
+    ADD CONSTRAINT moderation_discord_guild_id_fkey
+    FOREIGN KEY (discord_guild_id) REFERENCES guilds (discord_guild_id)
+    ON DELETE CASCADE NOT VALID;
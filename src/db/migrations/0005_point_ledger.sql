@@ -0,0 +1,19 @@
+----------------------------------------------------------------
+-- POINT_LEDGER
+-- One row per message that earned points, so deleting the message
+-- can take back exactly what was awarded, even when discord no longer
+-- has the message cached. Rows older than the retention window are
+-- rolled up (dropped) by DB.rollup_point_ledger, their points stay in the points table.
+----------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS point_ledger (
+    message_id BIGINT PRIMARY KEY,
+    discord_guild_id BIGINT NOT NULL,
+    discord_member_id BIGINT NOT NULL,
+    points INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- The ledger is append-only, so a BRIN index keeps the rollup cheap at a tiny size.
+CREATE INDEX IF NOT EXISTS point_ledger_created_at_idx
+    ON point_ledger USING BRIN (created_at);
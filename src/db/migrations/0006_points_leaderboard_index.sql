@@ -0,0 +1,7 @@
+----------------------------------------------------------------
+-- Index for reading a guild's points from most to least,
+-- which is how the leaderboard is loaded and queried.
+----------------------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS points_discord_guild_id_points_idx
+    ON points (discord_guild_id, points DESC);
@@ -0,0 +1,10 @@
+----------------------------------------------------------------
+-- One channel_settings row per channel, so DB.set_log_channel can upsert it.
+----------------------------------------------------------------
+
+DELETE FROM channel_settings a USING channel_settings b
+    WHERE a.id < b.id AND a.channel_id = b.channel_id;
+
+DROP INDEX IF EXISTS channel_settings_channel_id_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS channel_settings_channel_id_key
+    ON channel_settings (channel_id);
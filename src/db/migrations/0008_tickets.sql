@@ -0,0 +1,21 @@
+----------------------------------------------------------------
+-- TICKETS
+-- One row per ticket thread, kept by the ticket registry so the ticket
+-- logs can tell ticket threads apart without reading the audit log.
+-- status is 'open' or 'closed', closed_at is set when it is closed.
+----------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS tickets (
+    thread_id BIGINT PRIMARY KEY,
+    discord_guild_id BIGINT NOT NULL,
+    parent_channel_id BIGINT,
+    owner_id BIGINT,
+    name TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    closed_at TIMESTAMP
+);
+
+-- The registry loads, and lists, the open tickets of each guild.
+CREATE INDEX IF NOT EXISTS tickets_open_discord_guild_id_idx
+    ON tickets (discord_guild_id) WHERE status = 'open';
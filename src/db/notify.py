@@ -0,0 +1,155 @@
+import json
+import uuid
+import asyncio
+import logging
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "zorak_cache"
+MAX_PAYLOAD_BYTES = 7999  # NOTIFY payloads must be shorter than 8000 bytes.
+
+
+class CacheNotifier:
+    """
+    Keeps the in-process caches of every bot process in sync, through Postgres LISTEN/NOTIFY.
+
+    Writes to settings, points and members publish a small JSON payload on the
+    zorak_cache channel. Every process holds a dedicated LISTEN connection, and
+    patches or invalidates its own caches as the payloads arrive.
+    Payloads published by this process are ignored, its caches are already up to date.
+    """
+
+    def __init__(self, db):
+        """
+        :param db: The DB object whose caches are kept in sync
+        """
+        self.db = db
+        self.origin = uuid.uuid4().hex[:12]
+        self.received = 0
+        self._task = None
+
+    def start(self):
+        """
+        Starts listening in the background.
+        """
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """
+        Stops listening, and closes the LISTEN connection.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, kind, **data):
+        """
+        Tells the other processes about a write.
+        Points payloads are split so each one fits in a single notification.
+
+        :param kind: One of settings, points, members, member_update, tickets
+        :param data: What changed, see _dispatch
+        """
+        if kind == "points":
+            payloads = self._split_rows(kind, "totals", data["totals"])
+        else:
+            payloads = [self._encode({"kind": kind, "origin": self.origin, **data})]
+
+        try:
+            async with self.db.pool.connection() as connection:
+                for payload in payloads:
+                    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+                        logger.warning(f"Skipped a {kind} notification of {len(payload.encode())} bytes, over the limit.")
+                        continue
+                    await connection.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+        except Exception as e:
+            logger.warning(f"Failed to notify other processes of a {kind} change. Error: {e}")
+
+    def _split_rows(self, kind, key, rows):
+        """
+        Splits rows over as few payloads as possible, each one under MAX_PAYLOAD_BYTES once encoded.
+
+        :return: list - the encoded payloads
+        """
+        envelope = self._encode({"kind": kind, "origin": self.origin, key: []})
+        head, tail = envelope[:-2], envelope[-2:]  # Rows go between the brackets of the empty list
+        payloads, chunk, size = [], [], len(envelope.encode())
+        for row in rows:
+            encoded = self._encode(list(row))
+            row_size = len(encoded.encode()) + (1 if chunk else 0)  # The comma before it
+            if chunk and size + row_size > MAX_PAYLOAD_BYTES:
+                payloads.append(head + ",".join(chunk) + tail)
+                chunk, size = [], len(envelope.encode())
+                row_size -= 1
+            chunk.append(encoded)
+            size += row_size
+        if chunk:
+            payloads.append(head + ",".join(chunk) + tail)
+        return payloads
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, separators=(",", ":"))
+
+    async def _listen(self):
+        """
+        Holds the LISTEN connection, reconnecting whenever it drops.
+        Caches may have missed notifications while disconnected, so they are reset on reconnect.
+        """
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.db.conn_string, autocommit=True) as connection:
+                    await connection.execute(f"LISTEN {CHANNEL}")
+                    logger.info(f"Listening for cache notifications on '{CHANNEL}'.")
+                    if delay > 1:
+                        self.db.settings.invalidate()
+                        self.db.leaderboard.invalidate()
+                        self.db.member_cache.invalidate()
+                    delay = 1
+                    async for notification in connection.notifies():
+                        self._dispatch(notification.payload)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache notification listener disconnected, retrying in {delay}s. Error: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def _dispatch(self, raw_payload):
+        """
+        Applies a notification to the local caches.
+        """
+        payload = json.loads(raw_payload)
+        if payload.get("origin") == self.origin:
+            return
+        self.received += 1
+
+        kind = payload["kind"]
+        if kind == "settings":
+            self.db.settings.invalidate(payload.get("guild_id"))
+
+        elif kind == "points":
+            self.db.leaderboard.apply(tuple(row) for row in payload["totals"])
+
+        elif kind == "tickets":
+            self.db.tickets.apply(payload["thread_id"], payload["guild_id"], payload["parent_id"]
+                                  , payload["owner_id"], payload["name"], payload["status"])
+
+        elif kind == "member_update":
+            self.db.member_cache.invalidate(payload["guild_id"], payload["member_id"])
+
+        elif kind == "members":
+            self.db.member_cache.invalidate(payload.get("guild_id"), payload.get("member_id"))
+            if payload.get("member_id") is None:
+                self.db.leaderboard.invalidate(payload.get("guild_id"))
+            else:
+                self.db.leaderboard.remove(payload["guild_id"], payload["member_id"])
+
+        logger.debug(f"Applied a {kind} cache notification from {payload.get('origin')}")
@@ -0,0 +1,207 @@
+import os
+import asyncio
+import logging
+from time import perf_counter
+from psycopg import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class PointAccumulator:
+    """
+    Write-behind buffer for member points.
+
+    The points awarded per message, and the messages whose points must be taken
+    back, are kept in memory and written to the database in batches, either every
+    POINTS_FLUSH_INTERVAL seconds or as soon as POINTS_FLUSH_MAX_PENDING messages are pending.
+    Awards go through the point ledger, so a deleted message reverts exactly what it earned.
+
+    Rows the database refuses are found by splitting the batch in halves, and dropped alone.
+    A batch that fails for another reason is retried, up to POINTS_FLUSH_MAX_RETRIES flushes in a row,
+    then dropped, so an unreachable database cannot make the buffer grow without limit.
+    """
+
+    def __init__(self, db, interval=None, max_pending=None, max_retries=None):
+        """
+        Parameters
+        ----------
+        :param db: The DB object used to write the points
+        :param interval: Seconds between two flushes
+        :param max_pending: Number of pending messages that triggers an early flush
+        :param max_retries: Number of failed flushes in a row after which the pending points are dropped
+        """
+        self.db = db
+        self.interval = interval or float(os.getenv("POINTS_FLUSH_INTERVAL", 10))
+        self.max_pending = max_pending or int(os.getenv("POINTS_FLUSH_MAX_PENDING", 1000))
+        self.max_retries = max_retries or int(os.getenv("POINTS_FLUSH_MAX_RETRIES", 5))
+
+        self.pending_awards = {}
+        self.pending_reverts = set()
+        self._lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.retries = 0
+        self.dropped = 0
+        self.last_flush_size = 0
+        self.last_flush_latency = 0.0
+
+    def start(self):
+        """
+        Starts flushing in the background, unless it already does.
+        """
+        if self._task is not None:
+            return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the background flushing, then writes whatever is still pending.
+        """
+        self._closing = True
+        self._flush_requested.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        # What was queued while the last flush of the task was running.
+        await self.flush()
+
+    def award(self, message_id, guild_id, member_id, amount):
+        """
+        Queues the points a message earned its author.
+
+        :param message_id: The ID of the Message
+        :param guild_id: The ID of the Guild
+        :param member_id: The ID of the Member
+        :param amount: The amount of points
+        """
+        self.pending_awards[message_id] = (guild_id, member_id, amount)
+        self._check_size()
+
+    def revert(self, message_ids):
+        """
+        Takes back the points of deleted messages.
+        Messages that were not written yet are simply dropped from the buffer,
+        the others are reverted on the next flush, after any award still being written.
+
+        :param message_ids: An iterable of message IDs
+        """
+        for message_id in message_ids:
+            if self.pending_awards.pop(message_id, None) is None:
+                self.pending_reverts.add(message_id)
+        self._check_size()
+
+    def discard(self, guild_id, member_id):
+        """
+        Drops the pending awards of a member, e.g. when they leave the guild.
+        """
+        self.pending_awards = {
+            message_id: award for message_id, award in self.pending_awards.items()
+            if award[:2] != (guild_id, member_id)
+        }
+
+    async def flush(self):
+        """
+        Writes all pending awards, then all pending reverts, one statement each.
+        If a write fails, what it carried is kept and retried on the next flush, see the class docstring.
+        Both writes are idempotent per message, so a retry never counts a message twice.
+
+        :return: list - (guild_id, member_id, points) tuples with the new points of every member touched
+        """
+        async with self._lock:
+            if not self.pending_awards and not self.pending_reverts:
+                return []
+            awards, self.pending_awards = self.pending_awards, {}
+            reverts, self.pending_reverts = self.pending_reverts, set()
+            flush_size = len(awards) + len(reverts)
+
+            start = perf_counter()
+            totals = []
+            try:
+                totals += await self._write(
+                    self.db.apply_point_awards, [(message_id, *award) for message_id, award in awards.items()]
+                )
+                awards = {}
+                totals += await self._write(self.db.revert_point_awards, list(reverts))
+            except Exception as e:
+                self.failed_flushes += 1
+                self.retries += 1
+                if self.retries >= self.max_retries:
+                    self.dropped += len(awards) + len(reverts)
+                    self.retries = 0
+                    logger.warning(f"Failed to flush points {self.max_retries} times in a row, dropped "
+                                   f"{len(awards)} awards and {len(reverts)} reverts. Error: {e}")
+                else:
+                    self.pending_awards = {**awards, **self.pending_awards}
+                    self.pending_reverts |= reverts
+                    logger.warning(f"Failed to flush points, will retry. Error: {e}")
+                return totals
+
+            self.retries = 0
+            self.flushes += 1
+            self.last_flush_size = flush_size
+            self.last_flush_latency = perf_counter() - start
+            logger.debug(f"Flushed points in {self.last_flush_latency * 1000:.1f} ms")
+            return totals
+
+    def stats(self):
+        """
+        Returns the state of the buffer.
+
+        :return: dict - backlog size, flush counters and the latency of the last flush in ms
+        """
+        return {
+            "backlog": len(self.pending_awards) + len(self.pending_reverts),
+            "pending_awards": len(self.pending_awards),
+            "pending_reverts": len(self.pending_reverts),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 1),
+        }
+
+    async def _write(self, write, rows):
+        """
+        Writes rows in one statement. When the database refuses the statement, e.g. for a foreign key,
+        writes each half on its own, down to the single rows, which are dropped.
+
+        :param write: DB method taking the rows
+        :param rows: list - the rows to write
+        :return: list - (guild_id, member_id, points) tuples of the rows that were written
+        """
+        if not rows:
+            return []
+        try:
+            return await write(rows)
+        except IntegrityError as e:
+            if len(rows) == 1:
+                self.dropped += 1
+                logger.warning(f"Dropped points the database refuses: {rows[0]}. Error: {e}")
+                return []
+            middle = len(rows) // 2
+            return await self._write(write, rows[:middle]) + await self._write(write, rows[middle:])
+
+    def _check_size(self):
+        """
+        Requests an early flush when too much is pending.
+        Not while flushes are failing: the next one is tried on the interval, not on every message.
+        """
+        if self.retries == 0 and len(self.pending_awards) + len(self.pending_reverts) >= self.max_pending:
+            self._flush_requested.set()
+
+    async def _run(self):
+        """
+        Flushes every interval, or earlier when requested, until stopped.
+        """
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
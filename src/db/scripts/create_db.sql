@@ -14,7 +14,7 @@ DO $$
         -- Create the table
         CREATE TABLE guilds (
             id SERIAL PRIMARY KEY,
-            discord_guild_id TEXT,
+            discord_guild_id TEXT UNIQUE,
             name TEXT,
             logo TEXT,
             member_count INT,
@@ -23,6 +23,7 @@ DO $$
             is_premium BOOL,
             is_test BOOL,
             created_at TIMESTAMP,
+            sync_hash BIGINT,
             last_sync TIMESTAMP
         );
     END IF;
@@ -43,7 +44,9 @@ DO $$
             top_role TEXT,
             joined_at TIMESTAMP,
             created_at TIMESTAMP,
-            last_sync TIMESTAMP
+            sync_hash BIGINT,
+            last_sync TIMESTAMP,
+            UNIQUE (discord_guild_id, discord_member_id)
             -- FOREIGN KEY (discord_guild_id) REFERENCES guilds(discord_guild_id)
         );
     END IF;
@@ -56,7 +59,7 @@ DO $$
         CREATE TABLE channels (
             id SERIAL PRIMARY KEY,
             discord_guild_id TEXT,
-            channel_id TEXT,
+            channel_id TEXT UNIQUE,
             channel_name TEXT,
             category TEXT,
             position INT,
@@ -65,6 +68,7 @@ DO $$
             permissions_synced BOOL,
             overwrites TEXT,
             created_at TIMESTAMP,
+            sync_hash BIGINT,
             last_synced TIMESTAMP
             -- FOREIGN KEY (discord_guild_id) REFERENCES guilds(discord_guild_id)
         );
@@ -98,7 +102,7 @@ DO $$
         CREATE TABLE roles (
             id SERIAL PRIMARY KEY,
             discord_guild_id TEXT,
-            role_id TEXT,
+            role_id TEXT UNIQUE,
             name TEXT,
             position INT,
             color TEXT,
@@ -107,6 +111,7 @@ DO $$
             managed BOOL,
             permissions TEXT,
             created_at TIMESTAMP,
+            sync_hash BIGINT,
             last_synced TIMESTAMP
             -- FOREIGN KEY (discord_guild_id) REFERENCES guilds(discord_guild_id)
         );
@@ -134,7 +139,7 @@ DO $$
         -- Create the bot_settings table
         CREATE TABLE bot_settings (
             id SERIAL PRIMARY KEY,
-            discord_guild_id TEXT,
+            discord_guild_id TEXT UNIQUE,
             discord_bot_id TEXT,
             admin BOOL,
             moderation BOOL,
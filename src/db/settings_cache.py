@@ -0,0 +1,111 @@
+import os
+import logging
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+LOG_TYPES = ("join_log", "chat_log", "moderation_log", "server_log")
+FEATURES = ("admin", "moderation", "logging", "antispam", "fun")
+
+SETTINGS_QUERY = """
+                SELECT
+                    COALESCE(b.discord_guild_id, c.discord_guild_id)
+                    , b.admin, b.moderation, b.logging, b.antispam, b.fun
+                    , c.channel_id, c.join_log, c.chat_log, c.moderation_log, c.server_log
+                FROM
+                    bot_settings b
+                    FULL OUTER JOIN channel_settings c
+                        ON c.discord_guild_id = b.discord_guild_id
+                """
+
+
+class GuildSettings:
+    """
+    The cached bot_settings and channel_settings of one guild.
+    """
+    __slots__ = ("features", "log_channels", "loaded_at")
+
+    def __init__(self):
+        self.features = {}
+        self.log_channels = {}
+        self.loaded_at = monotonic()
+
+    def add_row(self, row):
+        """
+        Adds one row of SETTINGS_QUERY to the settings.
+        """
+        _, *features, channel_id, join_log, chat_log, moderation_log, server_log = row
+        if features[0] is not None:
+            self.features = dict(zip(FEATURES, features))
+        if channel_id is not None:
+            for log_type, enabled in zip(LOG_TYPES, (join_log, chat_log, moderation_log, server_log)):
+                if enabled:
+                    self.log_channels[log_type] = channel_id
+
+
+class SettingsCache:
+    """
+    Read-through cache of the per-guild bot_settings and channel_settings.
+
+    Every guild is loaded in one query at startup, then served from memory.
+    A guild older than SETTINGS_CACHE_TTL seconds, or invalidated after a write,
+    is read again on its next lookup.
+    """
+
+    def __init__(self, db, ttl=None):
+        """
+        :param db: The DB object used to load the settings
+        :param ttl: Seconds a guild's settings are served from memory
+        """
+        self.db = db
+        self.ttl = ttl or float(os.getenv("SETTINGS_CACHE_TTL", 300))
+        self.guilds = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def load_all(self):
+        """
+        Loads the settings of every guild in a single query.
+        """
+        guilds = {}
+        for row in await self.db.select_all(SETTINGS_QUERY):
+            guilds.setdefault(row[0], GuildSettings()).add_row(row)
+        self.guilds = guilds
+        logger.info(f"Loaded the settings of {len(guilds)} guilds.")
+
+    async def get(self, guild_id):
+        """
+        Returns the settings of a guild, from memory if they are fresh.
+
+        :param guild_id: The ID of the Guild
+        :return: GuildSettings
+        """
+        guild_id = int(guild_id)
+        settings = self.guilds.get(guild_id)
+        if settings is not None and monotonic() - settings.loaded_at < self.ttl:
+            self.hits += 1
+            return settings
+
+        self.misses += 1
+        settings = GuildSettings()
+        for row in await self.db.select_all(
+                SETTINGS_QUERY + " WHERE COALESCE(b.discord_guild_id, c.discord_guild_id) = (%s)", guild_id):
+            settings.add_row(row)
+        # Guilds without settings are cached too, so they don't hit the database on every event.
+        self.guilds[guild_id] = settings
+        return settings
+
+    def invalidate(self, guild_id=None):
+        """
+        Drops the cached settings of a guild, or of every guild.
+        """
+        if guild_id is None:
+            self.guilds.clear()
+        else:
+            self.guilds.pop(int(guild_id), None)
+
+    def stats(self):
+        """
+        :return: dict - cached guilds, hits and misses
+        """
+        return {"guilds": len(self.guilds), "hits": self.hits, "misses": self.misses}
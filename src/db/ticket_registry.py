@@ -0,0 +1,195 @@
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TICKET_PREFIX = "[Ticket]"
+
+TICKETS_QUERY = """
+                SELECT
+                    thread_id, discord_guild_id, parent_channel_id, owner_id, name, status, created_at
+                FROM
+                    tickets
+                WHERE
+                    status = 'open'
+                """
+
+TICKET_PARENTS_QUERY = """
+                SELECT DISTINCT
+                    parent_channel_id
+                FROM
+                    tickets
+                """
+
+TICKET_QUERY = """
+                SELECT
+                    thread_id, discord_guild_id, parent_channel_id, owner_id, name, status, created_at
+                FROM
+                    tickets
+                WHERE
+                    thread_id = (%s)
+                """
+
+
+class Ticket:
+    """
+    One ticket thread.
+    """
+    __slots__ = ("thread_id", "guild_id", "parent_id", "owner_id", "name", "status", "created_at")
+
+    def __init__(self, thread_id, guild_id, parent_id, owner_id, name, status="open", created_at=None):
+        self.thread_id = thread_id
+        self.guild_id = guild_id
+        self.parent_id = parent_id
+        self.owner_id = owner_id
+        self.name = name
+        self.status = status
+        self.created_at = created_at or datetime.now()
+
+
+class TicketRegistry:
+    """
+    The ticket threads of every guild, held in memory and persisted to the tickets table.
+
+    A thread is classified once, when it is created: its name starts with [Ticket] or it does not.
+    The open tickets are loaded in one query at startup, tickets closed while the bot runs stay known.
+    Closed tickets from before are read from the table when one of their threads comes back, see find,
+    only for threads of a channel that ever held a ticket.
+    Threads that are not tickets are never looked up anywhere, so their events cost nothing.
+    """
+
+    def __init__(self, db):
+        """
+        :param db: The DB object used to load and persist the tickets
+        """
+        self.db = db
+        self.tickets = {}
+        self.guilds = {}
+        self.parents = set()
+        self.backfilled = False
+
+    async def load_all(self):
+        """
+        Loads the open tickets of every guild in a single query.
+        """
+        self.tickets.clear()
+        self.guilds.clear()
+        self.parents = {parent_id for (parent_id,) in await self.db.select_all(TICKET_PARENTS_QUERY)}
+        for row in await self.db.select_all(TICKETS_QUERY):
+            self._add(Ticket(*row))
+        logger.info(f"Loaded {len(self.tickets)} open tickets.")
+
+    @staticmethod
+    def looks_like_ticket(thread):
+        """
+        :return: bool - whether the thread is named like a ticket
+        """
+        return thread.name.startswith(TICKET_PREFIX)
+
+    def get(self, thread_id):
+        """
+        :return: Ticket, None if the thread is not a known ticket
+        """
+        return self.tickets.get(int(thread_id))
+
+    def open_tickets(self, guild_id):
+        """
+        :return: list - the open tickets of a guild, oldest first
+        """
+        tickets = self.guilds.get(int(guild_id), {}).values()
+        return sorted((ticket for ticket in tickets if ticket.status == "open"), key=lambda ticket: ticket.created_at)
+
+    async def find(self, thread_id, thread=None, parent_id=None):
+        """
+        Returns a ticket from memory, else from the table, e.g. a ticket closed before the bot started.
+        A thread named like a ticket that the table does not know either, e.g. created before the
+        registry existed, is registered.
+
+        :param thread_id: The ID of the thread
+        :param thread: discord.Thread, if it is cached
+        :param parent_id: The ID of the thread's channel, when the thread is not cached
+        :return: Ticket, None if the thread is not a ticket
+        """
+        ticket = self.get(thread_id)
+        if ticket is not None:
+            return ticket
+        if thread is not None and not self.looks_like_ticket(thread):
+            return None
+        if thread is None and parent_id is not None and int(parent_id) not in self.parents:
+            return None
+
+        row = await self.db.select_one(TICKET_QUERY, int(thread_id))
+        if row:
+            ticket = Ticket(*row)
+            self._add(ticket)
+            return ticket
+        return await self.register(thread) if thread is not None else None
+
+    async def backfill(self, guilds):
+        """
+        Brings the registry in line with the threads of the guilds, e.g. after a restart.
+        Active ticket threads are registered and opened, open tickets whose thread is no longer active,
+        archived or deleted while the bot was away, are closed.
+
+        :param guilds: The discord.Guild objects, with their active threads cached
+        :return: int - the tickets that were added or changed
+        """
+        changed = 0
+        for guild in guilds:
+            active = {thread.id for thread in guild.threads}
+            for thread in guild.threads:
+                if not self.looks_like_ticket(thread):
+                    continue
+                known = thread.id in self.tickets
+                ticket = await self.find(thread.id, thread)
+                if not known or ticket.status != "open":
+                    changed += 1
+                    await self.set_status(thread.id, "open")
+            for ticket in self.open_tickets(guild.id):
+                if ticket.thread_id not in active:
+                    changed += 1
+                    await self.set_status(ticket.thread_id, "closed")
+        self.backfilled = True
+        return changed
+
+    async def register(self, thread):
+        """
+        Classifies a new thread, and records it if it is a ticket.
+
+        :param thread: discord.Thread
+        :return: Ticket, None if the thread is not a ticket
+        """
+        if not self.looks_like_ticket(thread):
+            return None
+        ticket = Ticket(thread.id, thread.guild.id, thread.parent_id, thread.owner_id, thread.name)
+        self._add(ticket)
+        await self.db.add_ticket(ticket)
+        return ticket
+
+    async def set_status(self, thread_id, status):
+        """
+        Opens or closes a known ticket.
+
+        :param thread_id: The ID of the ticket thread
+        :param status: open or closed
+        """
+        ticket = self.get(thread_id)
+        if ticket is None or ticket.status == status:
+            return
+        ticket.status = status
+        await self.db.update_ticket_status(ticket)
+
+    def apply(self, thread_id, guild_id, parent_id, owner_id, name, status):
+        """
+        Records a ticket written by another process, see db.notify.
+        """
+        ticket = self.get(thread_id)
+        if ticket is None:
+            self._add(Ticket(thread_id, guild_id, parent_id, owner_id, name, status))
+        else:
+            ticket.status = status
+
+    def _add(self, ticket):
+        self.tickets[ticket.thread_id] = ticket
+        self.guilds.setdefault(ticket.guild_id, {})[ticket.thread_id] = ticket
+        self.parents.add(ticket.parent_id)
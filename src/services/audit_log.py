@@ -0,0 +1,288 @@
+import os
+import asyncio
+import logging
+from collections import deque, OrderedDict
+from datetime import timedelta
+from time import monotonic
+from discord import utils, AuditLogAction
+from discord.ext.commands import Bot
+
+logger = logging.getLogger(__name__)
+
+# Seconds an entry can explain a new event, by action, AUDIT_LOG_MAX_AGE for the others.
+# An entry is written when the action happens, it only has to outlast the gateway delay,
+# or the window of the cogs that collect their events first (ROLE_LOG_WINDOW).
+ACTION_MAX_AGES = {
+    AuditLogAction.message_delete: 10,
+    AuditLogAction.ban: 15,
+    AuditLogAction.kick: 15,
+    AuditLogAction.member_role_update: 30,
+    AuditLogAction.thread_create: 15,
+    AuditLogAction.thread_update: 15,
+    AuditLogAction.thread_delete: 15,
+}
+CONSUMED_SIZE = 1000  # Entries remembered as used up
+
+
+class GuildAuditLog:
+    """
+    The most recent audit log entries of one guild, as they arrive over the gateway.
+    Entries are kept in a ring buffer, and indexed by (action, target ID) to the newest one.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: Number of entries kept
+        """
+        self.entries = deque(maxlen=size)
+        self.index = {}
+
+    def add(self, entry):
+        """
+        Adds an entry, dropping the oldest one if the buffer is full.
+        """
+        if len(self.entries) == self.entries.maxlen:
+            oldest = self.entries[0]
+            key = (oldest.action, getattr(oldest.target, "id", None))
+            if self.index.get(key) is oldest:
+                del self.index[key]
+        self.entries.append(entry)
+        self.index[(entry.action, getattr(entry.target, "id", None))] = entry
+
+    def find(self, actions, target_id=None, accept=None):
+        """
+        :param accept: Function telling if an entry can be returned
+        :return: discord.AuditLogEntry - the newest accepted entry for any of the actions, None if there is none
+        """
+        if target_id is not None:
+            found = [self.index[(action, target_id)] for action in actions if (action, target_id) in self.index]
+            newest = max(found, key=lambda entry: entry.id, default=None)
+            if newest is None or accept is None or accept(newest):
+                return newest
+
+        # The newest entry was refused, e.g. it is about another channel: an older one may fit.
+        for entry in reversed(self.entries):
+            if ((not actions or entry.action in actions)
+                    and (target_id is None or getattr(entry.target, "id", None) == target_id)
+                    and (accept is None or accept(entry))):
+                return entry
+        return None
+
+
+class AuditLogService:
+    """
+    Shared audit log lookups for every cog.
+
+    New audit log entries are pushed to the bot over the gateway (on_audit_log_entry_create),
+    and kept in memory per guild, so most lookups never leave the process.
+    An entry that has not arrived after AUDIT_LOG_WAIT seconds is read from the REST API instead,
+    unless the guild's gateway stream is live: the bot has the moderation intent, and the guild sent
+    an entry in the last AUDIT_LOG_LIVE_WINDOW seconds. A missing entry then means there is none,
+    e.g. a member left on their own, or deleted their own message.
+
+    One gateway event usually wakes up several listeners that all want the same audit log entry,
+    e.g. on_raw_member_remove is handled by the ban, kick and leave logs.
+    Concurrent REST lookups for the same guild and actions share a single call,
+    and its result is reused for AUDIT_LOG_CACHE_TTL seconds.
+
+    An entry only explains events close to it, see ACTION_MAX_AGES. Lookups that consume the entry
+    they find, e.g. for one deleted message, never get it again, unless Discord counted another action
+    in it since (message deletes by the same moderator are merged into one entry).
+    """
+
+    def __init__(self, bot, ttl=None, limit=None, buffer_size=None, wait=None, max_age=None, live_window=None):
+        """
+        :param bot: The bot, to know if it receives the audit log over the gateway
+        :param ttl: Seconds a fetched page of entries is reused for
+        :param limit: Number of entries fetched per REST call
+        :param buffer_size: Number of gateway entries kept per guild
+        :param wait: Seconds to wait for an entry to arrive over the gateway
+        :param max_age: Seconds after which an entry is too old to describe a new event
+        :param live_window: Seconds the gateway stream of a guild is trusted for after its last entry
+        """
+        self.bot = bot
+        self.ttl = ttl or float(os.getenv("AUDIT_LOG_CACHE_TTL", 2))
+        self.limit = limit or int(os.getenv("AUDIT_LOG_FETCH_LIMIT", 5))
+        self.buffer_size = buffer_size or int(os.getenv("AUDIT_LOG_BUFFER_SIZE", 200))
+        self.wait = wait or float(os.getenv("AUDIT_LOG_WAIT", 1.5))
+        self.max_age = timedelta(seconds=max_age or float(os.getenv("AUDIT_LOG_MAX_AGE", 60)))
+        self.live_window = live_window or float(os.getenv("AUDIT_LOG_LIVE_WINDOW", 3600))
+
+        self.guilds = {}
+        self.entries = {}
+        self.consumed = OrderedDict()
+        self.received = {}
+        self._fetching = {}
+        self._waiters = {}
+
+        self.requests = 0
+        self.buffer_hits = 0
+        self.skipped_fetches = 0
+        self.fetches = 0
+
+    async def on_audit_log_entry_create(self, entry):
+        """
+        Stores a new entry, and hands it to the lookups waiting for it.
+        """
+        guild_log = self.guilds.get(entry.guild.id)
+        if guild_log is None:
+            guild_log = self.guilds[entry.guild.id] = GuildAuditLog(self.buffer_size)
+        guild_log.add(entry)
+        self.received[entry.guild.id] = monotonic()
+
+        target_id = getattr(entry.target, "id", None)
+        for key in ((entry.guild.id, entry.action, target_id), (entry.guild.id, entry.action, None)):
+            for waiter, accept in self._waiters.get(key, {}).items():
+                if not waiter.done() and accept(entry):
+                    waiter.set_result(entry)
+
+    async def find(self, guild, *actions, target=None, channel_id=None, consume=False):
+        """
+        Returns the newest audit log entry of a guild for the given actions.
+
+        The entry is looked up in memory first, then waited for a moment in case
+        the gateway has not delivered it yet, then read from the REST API if the gateway stream may have missed it.
+        Over REST, Discord filters each action, one request per action.
+
+        :param guild: discord.Guild
+        :param actions: discord.AuditLogAction - the actions to look for
+        :param target: Only return an entry about this object, e.g. a discord.Member
+        :param channel_id: Only return an entry that happened in this channel, e.g. for message deletes
+        :param consume: Whether the entry is used up by this lookup, listeners sharing an event must not consume it
+        :return: discord.AuditLogEntry, None if there is no matching entry
+        """
+        self.requests += 1
+        actions = frozenset(actions)
+        target_id = getattr(target, "id", None)
+
+        def accept(candidate):
+            channel = getattr(candidate.extra, "channel", None)
+            return self._is_usable(candidate) and (channel_id is None or getattr(channel, "id", None) == channel_id)
+
+        entry = self._find_buffered(guild.id, actions, target_id, accept)
+        if entry is None:
+            entry = await self._wait_for(guild.id, actions, target_id, accept)
+        if entry is not None:
+            self.buffer_hits += 1
+        elif self.is_live(guild.id):
+            self.skipped_fetches += 1
+        else:
+            try:
+                entries = await self._get_entries(guild, actions)
+            except Exception as e:
+                logger.warning(f"Failed to read the audit log of guild: {guild.id}. Error: {e}")
+                return None
+            entry = next((entry for entry in entries
+                          if (target is None or getattr(entry.target, "id", None) == target_id) and accept(entry)),
+                         None)
+
+        if entry is not None and consume:
+            self._consume(entry)
+        return entry
+
+    def stats(self):
+        """
+        :return: dict - lookups asked for, lookups served from memory, lookups the live gateway stream answered
+            with no entry, and REST calls actually made
+        """
+        return {"requests": self.requests, "buffer_hits": self.buffer_hits, "skipped_fetches": self.skipped_fetches,
+                "fetches": self.fetches}
+
+    def is_live(self, guild_id):
+        """
+        :return: bool - whether the guild's new entries are known to arrive over the gateway
+        """
+        received = self.received.get(guild_id)
+        return (self.bot.intents.moderation and received is not None
+                and monotonic() - received < self.live_window)
+
+    def _find_buffered(self, guild_id, actions, target_id, accept):
+        """
+        Returns the newest matching gateway entry that is accepted.
+        """
+        guild_log = self.guilds.get(guild_id)
+        return guild_log.find(actions, target_id, accept) if guild_log is not None else None
+
+    def _is_usable(self, entry):
+        """
+        Old entries, e.g. a kick from before the member came back, must not be mistaken for a new event.
+        Neither must consumed ones, unless Discord merged another action into them since.
+        """
+        count = getattr(entry.extra, "count", None)
+        if entry.id in self.consumed:
+            consumed_count = self.consumed[entry.id]
+            return count is not None and consumed_count is not None and count > consumed_count
+        max_age = ACTION_MAX_AGES.get(entry.action)
+        max_age = timedelta(seconds=max_age) if max_age is not None else self.max_age
+        return utils.utcnow() - entry.created_at <= max_age
+
+    def _consume(self, entry):
+        self.consumed[entry.id] = getattr(entry.extra, "count", None)
+        self.consumed.move_to_end(entry.id)
+        if len(self.consumed) > CONSUMED_SIZE:
+            self.consumed.popitem(last=False)
+
+    async def _wait_for(self, guild_id, actions, target_id, accept):
+        """
+        Waits for a matching entry to arrive over the gateway.
+
+        :return: discord.AuditLogEntry, None if it did not arrive in time
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        keys = [(guild_id, action, target_id) for action in actions]
+        for key in keys:
+            self._waiters.setdefault(key, {})[waiter] = accept
+        try:
+            return await asyncio.wait_for(waiter, timeout=self.wait)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            for key in keys:
+                self._waiters[key].pop(waiter, None)
+                if not self._waiters[key]:
+                    del self._waiters[key]
+
+    async def _get_entries(self, guild, actions):
+        """
+        Returns the cached entries for a guild and set of actions, fetching them if they are stale.
+        """
+        key = (guild.id, actions)
+        cached = self.entries.get(key)
+        if cached is not None and monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        # Concurrent callers share a single fetch.
+        if key not in self._fetching:
+            self._fetching[key] = asyncio.ensure_future(self._fetch(guild, actions))
+        return await asyncio.shield(self._fetching[key])
+
+    async def _fetch(self, guild, actions):
+        key = (guild.id, actions)
+        try:
+            # One page per action: an unfiltered page of a busy guild may not reach the entry.
+            pages = await asyncio.gather(*(self._fetch_page(guild, action) for action in actions or (None,)))
+            entries = sorted((entry for page in pages for entry in page), key=lambda entry: entry.id, reverse=True)
+            self.entries[key] = (monotonic(), entries)
+            self._prune()
+            return entries
+        finally:
+            del self._fetching[key]
+
+    async def _fetch_page(self, guild, action):
+        self.fetches += 1
+        filters = {"action": action} if action is not None else {}
+        return [entry async for entry in guild.audit_logs(limit=self.limit, **filters)]
+
+    def _prune(self):
+        """
+        Drops the cached entries that went stale.
+        """
+        now = monotonic()
+        for key in [key for key, (fetched_at, _) in self.entries.items() if now - fetched_at >= self.ttl]:
+            del self.entries[key]
+
+
+def init_audit_log(bot: Bot):
+    # This is called in the main bot file, every cog reads the audit log through bot.audit_log.
+    bot.audit_log = AuditLogService(bot)
+    bot.add_listener(bot.audit_log.on_audit_log_entry_create)
@@ -0,0 +1,93 @@
+import os
+import logging
+from collections import OrderedDict
+from discord.ext.commands import Bot
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelResolver:
+    """
+    Finds the log channel of a guild without a REST call in the steady state.
+
+    The channel ID comes from the settings cache, the channel itself from the gateway cache.
+    Channels the gateway cache does not hold are fetched once, then kept in an LRU of
+    CHANNEL_CACHE_SIZE channels, until they are updated or deleted.
+    """
+
+    def __init__(self, bot, size=None):
+        """
+        :param bot: The bot, used to look up and fetch the channels
+        :param size: Number of fetched channels kept
+        """
+        self.bot = bot
+        self.size = size or int(os.getenv("CHANNEL_CACHE_SIZE", 256))
+        self.fetched = OrderedDict()
+
+        self.fetches = 0
+
+    async def resolve(self, guild, log_type):
+        """
+        Returns the log channel of a guild for one type of log.
+
+        :param guild: discord.Guild
+        :param log_type: One of join_log, chat_log, moderation_log, server_log
+        :return: discord.abc.GuildChannel, None if the guild has no such log channel
+        """
+        channel_id = await self.bot.db.get_log_channel(guild.id, log_type)
+        if channel_id is None:
+            return None
+        return await self.get_channel(channel_id)
+
+    async def get_channel(self, channel_id):
+        """
+        Returns a channel from the gateway cache, the LRU, or the API, in that order.
+
+        :param channel_id: The ID of the Channel
+        :return: discord.abc.GuildChannel, None if it can't be found
+        """
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            return channel
+
+        channel = self.fetched.get(channel_id)
+        if channel is not None:
+            self.fetched.move_to_end(channel_id)
+            return channel
+
+        try:
+            self.fetches += 1
+            channel = await self.bot.fetch_channel(channel_id)
+        except Exception as e:
+            logger.warning(f"Failed to fetch channel: {channel_id}. Error: {e}")
+            return None
+
+        self.fetched[channel_id] = channel
+        if len(self.fetched) > self.size:
+            self.fetched.popitem(last=False)
+        return channel
+
+    def invalidate(self, channel_id):
+        """
+        Drops a fetched channel, so it is fetched again on its next use.
+        """
+        self.fetched.pop(channel_id, None)
+
+    async def on_guild_channel_update(self, before, after):
+        self.invalidate(after.id)
+
+    async def on_guild_channel_delete(self, channel):
+        self.invalidate(channel.id)
+
+    def stats(self):
+        """
+        :return: dict - fetched channels kept, and REST calls made
+        """
+        return {"fetched": len(self.fetched), "fetches": self.fetches}
+
+
+def init_channel_resolver(bot: Bot):
+    # This is called in the main bot file, the log channels of every cog are found through bot.channel_resolver.
+    bot.channel_resolver = ChannelResolver(bot)
+    bot.add_listener(bot.channel_resolver.on_guild_channel_update)
+    bot.add_listener(bot.channel_resolver.on_guild_channel_delete)
@@ -0,0 +1,94 @@
+import os
+import math
+import logging
+from time import monotonic
+from aiohttp import web
+from discord.ext.commands import Bot
+
+from cogs import discover_cogs
+
+logger = logging.getLogger(__name__)
+
+
+class HealthServer:
+    """
+    Tiny HTTP server for the orchestrator, listening on HEALTH_PORT.
+
+    /healthz - liveness: the process and its event loop answer. 503 once the bot is closed.
+    /readyz - readiness: the gateway is connected, the database pool answers and the cogs are loaded.
+    Both answer with a JSON body detailing every check, the status code carries the verdict.
+    The database is not part of liveness, restarting the bot does not bring PostgreSQL back.
+    """
+
+    def __init__(self, bot, host=None, port=None):
+        """
+        :param bot: The bot whose state is reported
+        :param host: Address to listen on
+        :param port: Port to listen on, 0 to not start the server. 8080 by default, what docker-compose probes
+        """
+        self.bot = bot
+        self.host = host or os.getenv("HEALTH_HOST", "0.0.0.0")
+        self.port = port if port is not None else int(os.getenv("HEALTH_PORT", 8080))
+        self.started_at = monotonic()
+        self.cogs_loaded = False
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/healthz", self.healthz)
+        self.app.router.add_get("/readyz", self.readyz)
+
+    async def start(self):
+        """
+        Starts listening, if HEALTH_PORT is set.
+        """
+        if not self.port or self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            logger.warning(f"Failed to start the health server on {self.host}:{self.port}. Error: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        logger.info(f"Health server listening on {self.host}:{self.port}.")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def healthz(self, request):
+        alive = not self.bot.is_closed()
+        return web.json_response(
+            {"status": "ok" if alive else "closed", "uptime": round(monotonic() - self.started_at, 1)},
+            status=200 if alive else 503,
+        )
+
+    async def readyz(self, request):
+        checks = {"gateway": self.gateway(), "database": await self.database(), "cogs": self.cogs()}
+        ready = all(check["ok"] for check in checks.values())
+        return web.json_response({"status": "ready" if ready else "not ready", **checks}, status=200 if ready else 503)
+
+    def gateway(self):
+        # The latency stays infinite until the first heartbeat is acknowledged.
+        latency = self.bot.latency
+        connected = self.bot.is_ready() and not self.bot.is_closed() and math.isfinite(latency)
+        return {"ok": connected, "latency": round(latency, 3) if math.isfinite(latency) else None,
+                "guilds": len(self.bot.guilds)}
+
+    async def database(self):
+        db = getattr(self.bot, "db", None)
+        if db is None:
+            return {"ok": False, "pool": None}
+        return {"ok": await db.ping(), "pool": db.pool_stats()}
+
+    def cogs(self):
+        failed = sorted(set(discover_cogs()) - set(self.bot.extensions)) if self.cogs_loaded else []
+        return {"ok": self.cogs_loaded, "loaded": len(self.bot.extensions), "failed": failed}
+
+
+def init_health(bot: Bot):
+    # This is called in the main bot file, first, so the orchestrator can tell the bot is alive while it starts.
+    bot.health = HealthServer(bot)
@@ -0,0 +1,158 @@
+import os
+import sys
+import asyncio
+import logging
+from discord.ext.commands import Bot
+
+from services.intents import loaded_events, missing_intents
+
+logger = logging.getLogger(__name__)
+
+
+class HotReloader:
+    """
+    Reloads cogs in place, without restarting the bot.
+
+    Only the extension is reloaded: the gateway session, the member cache and the services stay as they are.
+    reload_extension puts the previous version of the module back when the new one fails to load.
+
+    Cogs whose state must survive a reload hand it off in cog_unload, and take it back in __init__:
+        if self.bot.hot_reload.is_reloading(__name__):
+            self.bot.hot_reload.hand_off(__name__, self.points, dispose=self.points.stop)
+    State that is not taken back, e.g. when the cog was removed, is disposed of after the reload.
+
+    With RELOAD_WATCH_INTERVAL set, the files of the loaded cogs are polled, and the changed ones reloaded.
+    """
+
+    def __init__(self, bot, interval=None):
+        """
+        :param bot: The bot whose extensions are reloaded
+        :param interval: Seconds between two polls of the cog files, 0 to not watch them
+        """
+        self.bot = bot
+        self.interval = interval if interval is not None else float(os.getenv("RELOAD_WATCH_INTERVAL", 0))
+        self.handoffs = {}
+        self.reloading = set()
+        self.mtimes = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    def start(self):
+        """
+        Starts watching the cog files in the background, if RELOAD_WATCH_INTERVAL is set.
+        """
+        if self.interval and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+            logger.info(f"Watching the cog files every {self.interval:.0f}s.")
+
+    def is_reloading(self, extension):
+        """
+        :return: bool - whether the extension is being unloaded to be loaded again
+        """
+        return extension in self.reloading
+
+    def hand_off(self, key, state, dispose=None):
+        """
+        Keeps state for the next version of a cog.
+
+        :param key: Usually the extension name, __name__
+        :param state: Anything, taken back as it is
+        :param dispose: Coroutine function called if nothing takes the state back
+        """
+        self.handoffs[key] = (state, dispose)
+
+    def take(self, key):
+        """
+        :return: The state handed off under this key, None if there is none
+        """
+        state, _ = self.handoffs.pop(key, (None, None))
+        return state
+
+    async def reload(self, extension):
+        """
+        Reloads one extension, or rolls it back to the version that was loaded.
+
+        :param extension: Extension name, e.g. cogs.logging.log_names
+        :return: bool - whether the new version is loaded
+        """
+        async with self._lock:
+            self.reloading.add(extension)
+            try:
+                await self.bot.reload_extension(extension)
+            except Exception as e:
+                self.failed_reloads += 1
+                logger.warning(f"Failed to reload {extension}, the previous version is kept. Error: {e}")
+                return False
+            finally:
+                self.reloading.discard(extension)
+                self.mtimes[extension] = self._mtime(extension)
+                await self._dispose()
+
+            self.reloads += 1
+            logger.info(f"Reloaded {extension}.")
+            self._check_intents(extension)
+            return True
+
+    def changed(self):
+        """
+        :return: list - the loaded extensions whose file changed since they were loaded
+        """
+        changed = []
+        for extension in self.bot.extensions:
+            mtime = self._mtime(extension)
+            if extension not in self.mtimes:
+                self.mtimes[extension] = mtime
+            elif mtime != self.mtimes[extension]:
+                changed.append(extension)
+        return changed
+
+    async def reload_changed(self):
+        """
+        :return: dict - whether each changed extension was reloaded, by name
+        """
+        return {extension: await self.reload(extension) for extension in self.changed()}
+
+    def stats(self):
+        return {"reloads": self.reloads, "failed_reloads": self.failed_reloads, "watching": self._task is not None}
+
+    async def _watch(self):
+        self.changed()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload_changed()
+            except Exception as e:
+                logger.warning(f"Failed to check the cog files for changes. Error: {e}")
+
+    async def _dispose(self):
+        handoffs, self.handoffs = self.handoffs, {}
+        for key, (state, dispose) in handoffs.items():
+            if dispose is None:
+                continue
+            try:
+                await dispose()
+            except Exception as e:
+                logger.warning(f"Failed to dispose of the state handed off by {key}. Error: {e}")
+
+    def _check_intents(self, extension):
+        # The intents are picked once, at startup. A new listener may need one the bot did not ask for.
+        missing = missing_intents(self.bot, loaded_events(self.bot, extension))
+        if missing:
+            logger.warning(f"{extension} listens to events that need intents the bot does not have: {missing}. "
+                           f"Restart the bot for them to be requested.")
+
+    @staticmethod
+    def _mtime(extension):
+        module = sys.modules.get(extension)
+        try:
+            return os.stat(module.__file__).st_mtime_ns
+        except (AttributeError, TypeError, OSError):
+            return None
+
+
+def init_hot_reload(bot: Bot):
+    # This is called in the main bot file, before the cogs are loaded, so they can take back their state.
+    bot.hot_reload = HotReloader(bot)
@@ -0,0 +1,187 @@
+import os
+import ast
+import logging
+import importlib.util
+import discord
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_INTENTS = ("guild_messages", "dm_messages", "message_content")
+
+# The intents each gateway event needs. Events missing here only need the guilds intent, or are not gateway events.
+EVENT_INTENTS = {
+    "on_message": MESSAGE_INTENTS,
+    "on_message_edit": MESSAGE_INTENTS,
+    "on_message_delete": MESSAGE_INTENTS,
+    "on_bulk_message_delete": MESSAGE_INTENTS,
+    "on_raw_message_edit": MESSAGE_INTENTS,
+    "on_raw_message_delete": MESSAGE_INTENTS,
+    "on_raw_bulk_message_delete": MESSAGE_INTENTS,
+    "on_member_join": ("members",),
+    "on_member_remove": ("members",),
+    "on_raw_member_remove": ("members",),
+    "on_member_update": ("members",),
+    "on_user_update": ("members",),
+    "on_presence_update": ("members", "presences"),
+    "on_member_ban": ("moderation",),
+    "on_member_unban": ("moderation",),
+    "on_audit_log_entry_create": ("moderation",),
+    "on_guild_emojis_update": ("emojis_and_stickers",),
+    "on_guild_stickers_update": ("emojis_and_stickers",),
+    "on_guild_integrations_update": ("integrations",),
+    "on_integration_create": ("integrations",),
+    "on_integration_update": ("integrations",),
+    "on_raw_integration_delete": ("integrations",),
+    "on_webhooks_update": ("webhooks",),
+    "on_invite_create": ("invites",),
+    "on_invite_delete": ("invites",),
+    "on_voice_state_update": ("voice_states",),
+    "on_reaction_add": ("guild_reactions", "dm_reactions"),
+    "on_reaction_remove": ("guild_reactions", "dm_reactions"),
+    "on_reaction_clear": ("guild_reactions", "dm_reactions"),
+    "on_raw_reaction_add": ("guild_reactions", "dm_reactions"),
+    "on_raw_reaction_remove": ("guild_reactions", "dm_reactions"),
+    "on_raw_reaction_clear": ("guild_reactions", "dm_reactions"),
+    "on_typing": ("guild_typing", "dm_typing"),
+    "on_raw_typing": ("guild_typing", "dm_typing"),
+    "on_scheduled_event_create": ("guild_scheduled_events",),
+    "on_scheduled_event_update": ("guild_scheduled_events",),
+    "on_scheduled_event_delete": ("guild_scheduled_events",),
+    "on_automod_rule_create": ("auto_moderation_configuration",),
+    "on_automod_rule_update": ("auto_moderation_configuration",),
+    "on_automod_rule_delete": ("auto_moderation_configuration",),
+    "on_automod_action": ("auto_moderation_execution",),
+}
+
+# Events the bot listens to outside of the cogs.
+CORE_EVENTS = (
+    "on_message",  # Prefix commands are read from messages
+    "on_audit_log_entry_create",  # services.audit_log
+    "on_guild_channel_update",  # services.channel_resolver
+    "on_guild_channel_delete",  # services.channel_resolver
+)
+
+# Events discord.py only dispatches for members it has cached, silent in MEMBER_MODE=lazy.
+# Their raw counterparts, e.g. on_raw_member_remove, fire for every member.
+CACHED_MEMBER_EVENTS = ("on_member_remove", "on_member_update", "on_user_update", "on_presence_update")
+
+
+def cog_events(extensions):
+    """
+    Lists the events the listeners of the cogs are registered for, read from their source.
+    The cogs are not imported: load_extension runs each module anyway, and would run it a second time.
+    Listeners registered in a way the source does not spell out are caught by missing_intents once loaded.
+
+    :param extensions: Extension names, e.g. cogs.fun.ping
+    :return: set - event names
+    """
+    events = set()
+    for extension in extensions:
+        try:
+            with open(importlib.util.find_spec(extension).origin) as file:
+                tree = ast.parse(file.read(), extension)
+        except Exception as e:
+            logger.warning(f"Failed to inspect cog: {extension}. Error: {e}")
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                events.update(_listener_name(node, decorator) for decorator in node.decorator_list
+                              if _is_listener(decorator))
+    return events
+
+
+def _is_listener(decorator):
+    # @commands.Cog.listener() or @Cog.listener(name='on_command')
+    return (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)
+            and decorator.func.attr == "listener")
+
+
+def _listener_name(function, decorator):
+    names = [*decorator.args, *(keyword.value for keyword in decorator.keywords if keyword.arg == "name")]
+    if names and isinstance(names[0], ast.Constant):
+        return names[0].value
+    return function.name
+
+
+def loaded_events(bot, extension=None):
+    """
+    Lists the events the loaded cogs listen to.
+
+    :param bot: The bot the cogs are loaded in
+    :param extension: Only the cogs of this extension, every cog if None
+    :return: set - event names
+    """
+    return {name for cog in bot.cogs.values() if extension is None or cog.__module__ == extension
+            for name, _ in cog.get_listeners()}
+
+
+def missing_intents(bot, events):
+    """
+    :param bot: The bot, with the intents it asked for
+    :param events: Event names
+    :return: list - the intents the events need that the bot does not have
+    """
+    return [name for name, enabled in intents_for(events) if enabled and not getattr(bot.intents, name)]
+
+
+def intents_for(events):
+    """
+    :param events: Event names
+    :return: discord.Intents - the smallest set of intents that delivers every event
+    """
+    intents = discord.Intents.none()
+    intents.guilds = True  # Guilds, channels, roles and threads, nothing works without them
+    for event in events:
+        for flag in EVENT_INTENTS.get(event, ()):
+            setattr(intents, flag, True)
+    return intents
+
+
+def resolve_intents(extensions):
+    """
+    Picks the intents of the bot, following INTENTS:
+    - auto: only what the cogs and the bot itself listen to (the default)
+    - all: every intent
+    - a comma separated list of intents, e.g. guilds,members,guild_messages
+
+    And how members are cached, following MEMBER_MODE:
+    - cached: every member of every guild is requested at startup and kept in memory (the default)
+    - lazy: members are not requested at startup, and only kept in memory while in a voice channel.
+      Cogs look members up with db.get_member, the database sync streams them from the API.
+
+    :param extensions: The extensions that will be loaded
+    :return: (discord.Intents, discord.MemberCacheFlags, bool - whether to chunk guilds at startup)
+    """
+    override = os.getenv("INTENTS", "auto").strip().lower()
+    events = cog_events(extensions) | set(CORE_EVENTS)
+    if override == "all":
+        intents = discord.Intents.all()
+    elif override == "auto":
+        intents = intents_for(events)
+        logger.debug(f"Events listened to: {sorted(events)}")
+    else:
+        intents = discord.Intents.none()
+        for flag in override.split(","):
+            if flag.strip() not in discord.Intents.VALID_FLAGS:
+                raise ValueError(f"Unknown intent in INTENTS: {flag}")
+            setattr(intents, flag.strip(), True)
+
+    member_mode = os.getenv("MEMBER_MODE", "cached").strip().lower()
+    if member_mode == "cached":
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+        chunk_guilds = intents.members
+    elif member_mode == "lazy":
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.voice = intents.voice_states
+        chunk_guilds = False
+        silent = sorted(events.intersection(CACHED_MEMBER_EVENTS))
+        if silent:
+            logger.warning(f"MEMBER_MODE=lazy: the cogs listen to {silent}, which only fire for cached members. "
+                           f"Those listeners will miss most members.")
+    else:
+        raise ValueError(f"Unknown MEMBER_MODE: {member_mode}")
+
+    logger.info(f"Intents ({override}): {sorted(name for name, enabled in intents if enabled)}")
+    logger.info(f"Member cache ({member_mode}): {sorted(name for name, enabled in member_cache_flags if enabled)}"
+                f", chunking guilds at startup: {chunk_guilds}")
+    return intents, member_cache_flags, chunk_guilds
@@ -0,0 +1,197 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from time import monotonic
+from discord.ext.commands import Bot
+
+from services.scheduler import BULK, SendDropped
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS = 6000  # Shared by every embed of a message
+
+
+class LogPipeline:
+    """
+    Outbound queue for the embeds of the logging cogs.
+
+    Embeds are queued per log channel, and handed to the send scheduler LOG_FLUSH_WINDOW seconds
+    after the first one arrives, packed up to 10 per message within Discord's size limits.
+    A burst of events (a raid, a mass role change...) becomes a handful of messages,
+    instead of one message per event hitting the channel's rate limit.
+
+    Logs are BULK traffic: while a channel waits for its bucket, new embeds are merged into
+    the queued message, and beyond LOG_QUEUE_SIZE queued embeds the oldest ones are dropped.
+    drain sends whatever is still queued when the bot closes.
+    """
+
+    def __init__(self, bot, window=None, queue_size=None):
+        """
+        :param bot: The bot, used to find the log channels and to send the logs
+        :param window: Seconds embeds are collected for before they are sent
+        :param queue_size: Embeds kept per channel while waiting to be sent
+        """
+        self.bot = bot
+        self.window = window or float(os.getenv("LOG_FLUSH_WINDOW", 1))
+        self.queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", 500))
+
+        self.queues = {}
+        self._scheduled = {}
+        self._timers = {}
+
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.embeds_dropped = 0
+        self.failed_sends = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    async def send(self, guild, log_type, embed):
+        """
+        Queues an embed for the log channel of a guild.
+        Nothing is sent if the guild has no such log channel, or turned logging off.
+
+        :param guild: discord.Guild
+        :param log_type: One of join_log, chat_log, moderation_log, server_log
+        :param embed: discord.Embed
+        """
+        if not await self.bot.db.is_feature_enabled(guild.id, "logging"):
+            return
+        channel = await self.bot.channel_resolver.resolve(guild, log_type)
+        if channel is None:
+            logger.debug(f"No {log_type} channel for guild: {guild.id}")
+            return
+        self.send_to(channel, embed)
+
+    def send_to(self, channel, embed):
+        """
+        Queues an embed for a channel.
+
+        :param channel: discord.abc.Messageable
+        :param embed: discord.Embed
+        """
+        if len(embed) > MAX_EMBED_CHARACTERS:
+            logger.warning(f"Dropped an embed of {len(embed)} characters for channel: {channel.id}")
+            return
+
+        queue = self.queues.setdefault(channel.id, deque())
+        if len(queue) >= self.queue_size:
+            queue.popleft()
+            self.embeds_dropped += 1
+        queue.append((monotonic(), embed))
+
+        if channel.id not in self._scheduled:
+            self._scheduled[channel.id] = channel
+            self._timers[channel.id] = asyncio.get_running_loop().call_later(self.window, self._submit, channel)
+
+    async def drain(self):
+        """
+        Sends every queued embed now, without waiting for the window or the send scheduler.
+        Called when the bot closes, after the cogs are unloaded and before the HTTP session is closed.
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        channels = list(self._scheduled.values())
+        await asyncio.gather(*(self._drain(channel) for channel in channels))
+        if channels:
+            logger.info(f"Sent the logs queued for {len(channels)} channels before closing.")
+
+    def stats(self):
+        """
+        Returns the state of the pipeline.
+
+        :return: dict - queued embeds, delivery counters and latencies in ms
+        """
+        depths = [len(queue) for queue in self.queues.values()]
+        return {
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "channels": len(depths),
+            "messages_sent": self.messages_sent,
+            "embeds_sent": self.embeds_sent,
+            "embeds_dropped": self.embeds_dropped,
+            "failed_sends": self.failed_sends,
+            "last_latency_ms": round(self.last_latency * 1000, 1),
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+        }
+
+    def _submit(self, channel):
+        """
+        Queues the next message of a channel in the send scheduler.
+        """
+        self._timers.pop(channel.id, None)
+        future = self.bot.scheduler.submit(
+            channel.id, partial(self._deliver, channel), BULK, merge_key=("logs", channel.id)
+        )
+        future.add_done_callback(partial(self._on_done, channel))
+
+    async def _deliver(self, channel):
+        """
+        Sends the oldest embeds queued for a channel, in one message.
+        """
+        batch = self._next_batch(self.queues.get(channel.id, ()))
+        if not batch:
+            # Already sent by drain.
+            return
+        try:
+            await channel.send(embeds=[embed for _, embed in batch])
+        except Exception as e:
+            self.failed_sends += 1
+            self.embeds_dropped += len(batch)
+            logger.warning(f"Failed to send {len(batch)} log embeds to channel: {channel.id}. Error: {e}")
+            return
+
+        self.messages_sent += 1
+        self.embeds_sent += len(batch)
+        self.last_latency = monotonic() - batch[0][0]
+        self.max_latency = max(self.max_latency, self.last_latency)
+
+    def _on_done(self, channel, future):
+        """
+        Queues the next message if embeds are left, or forgets the channel.
+        A message dropped by the scheduler takes the channel's queued embeds with it.
+        """
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            return
+        if future.cancelled() or isinstance(future.exception(), SendDropped):
+            logger.warning(f"Dropped {len(queue)} log embeds for channel: {channel.id}, the send scheduler dropped them.")
+            self.embeds_dropped += len(queue)
+            queue.clear()
+        if queue:
+            self._submit(channel)
+        else:
+            del self.queues[channel.id]
+            self._scheduled.pop(channel.id, None)
+
+    async def _drain(self, channel):
+        """
+        Sends every embed queued for a channel, one message after the other.
+        """
+        while self.queues.get(channel.id):
+            await self._deliver(channel)
+        self.queues.pop(channel.id, None)
+        self._scheduled.pop(channel.id, None)
+
+    @staticmethod
+    def _next_batch(queue):
+        """
+        Takes the oldest embeds that fit in a single message.
+        """
+        batch, characters = [], 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0][1])
+            if characters + size > MAX_EMBED_CHARACTERS:
+                break
+            batch.append(queue.popleft())
+            characters += size
+        return batch
+
+
+def init_log_pipeline(bot: Bot):
+    # This is called in the main bot file, every logging cog sends its embeds through bot.log_pipeline.
+    bot.log_pipeline = LogPipeline(bot)
@@ -0,0 +1,127 @@
+import os
+import zlib
+import logging
+from collections import OrderedDict, namedtuple
+from discord import utils
+from discord.ext.commands import Bot
+
+logger = logging.getLogger(__name__)
+
+StoredMessage = namedtuple("StoredMessage", "id guild_id channel_id author_id content created_at")
+
+EVICTION_POLICIES = ("fifo", "lru")
+
+
+class MessageStore:
+    """
+    The content of recent guild messages, so deletes and edits can be logged without
+    keeping full discord.Message objects in the discord.py message cache.
+
+    Each message is kept as a (channel_id, author_id, content) tuple, its creation time
+    comes from its snowflake. Content longer than MESSAGE_STORE_COMPRESS_AT characters
+    is zlib compressed. Every guild holds at most MESSAGE_STORE_SIZE messages, and evicts
+    the oldest one ("fifo") or the least recently used one ("lru") beyond that,
+    following MESSAGE_STORE_EVICTION.
+    """
+
+    def __init__(self, size=None, compress_at=None, eviction=None):
+        """
+        :param size: Messages kept per guild
+        :param compress_at: Content length from which content is compressed, 0 to never compress
+        :param eviction: fifo or lru
+        """
+        self.size = size or int(os.getenv("MESSAGE_STORE_SIZE", 10000))
+        self.compress_at = compress_at if compress_at is not None else int(os.getenv("MESSAGE_STORE_COMPRESS_AT", 256))
+        self.eviction = eviction or os.getenv("MESSAGE_STORE_EVICTION", "fifo")
+        if self.eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {self.eviction}")
+
+        self.guilds = {}
+        self.evicted = 0
+
+    async def on_message(self, message):
+        """
+        Stores every guild message that is not from a bot.
+        """
+        if message.guild is None or message.author.bot:
+            return
+        self.add(message.guild.id, message.id, message.channel.id, message.author.id, message.content)
+
+    def add(self, guild_id, message_id, channel_id, author_id, content):
+        """
+        Stores a message, evicting one if the guild is full.
+        """
+        messages = self.guilds.get(guild_id)
+        if messages is None:
+            messages = self.guilds[guild_id] = OrderedDict()
+        messages[message_id] = (channel_id, author_id, self._pack(content))
+        if len(messages) > self.size:
+            messages.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, guild_id, message_id):
+        """
+        :return: StoredMessage, None if the message is not stored
+        """
+        messages = self.guilds.get(guild_id)
+        if messages is None or message_id not in messages:
+            return None
+        if self.eviction == "lru":
+            messages.move_to_end(message_id)
+        return self._unpack(guild_id, message_id, messages[message_id])
+
+    def pop(self, guild_id, message_id):
+        """
+        Removes a message, e.g. once it was deleted.
+
+        :return: StoredMessage, None if the message is not stored
+        """
+        messages = self.guilds.get(guild_id)
+        if messages is None or message_id not in messages:
+            return None
+        return self._unpack(guild_id, message_id, messages.pop(message_id))
+
+    def update(self, guild_id, message_id, content):
+        """
+        Replaces the content of a stored message, e.g. once it was edited.
+        Messages that are not stored are ignored.
+        """
+        messages = self.guilds.get(guild_id)
+        if messages is None or message_id not in messages:
+            return
+        channel_id, author_id, _ = messages[message_id]
+        messages[message_id] = (channel_id, author_id, self._pack(content))
+        if self.eviction == "lru":
+            messages.move_to_end(message_id)
+
+    def stats(self):
+        """
+        :return: dict - guilds, stored and evicted messages, and how many are compressed
+        """
+        stored = [entry for messages in self.guilds.values() for entry in messages.values()]
+        return {
+            "guilds": len(self.guilds),
+            "messages": len(stored),
+            "compressed": sum(isinstance(entry[2], bytes) for entry in stored),
+            "evicted": self.evicted,
+        }
+
+    def _pack(self, content):
+        if self.compress_at and len(content) >= self.compress_at:
+            return zlib.compress(content.encode())
+        return content
+
+    @staticmethod
+    def _unpack(guild_id, message_id, entry):
+        channel_id, author_id, content = entry
+        if isinstance(content, bytes):
+            content = zlib.decompress(content).decode()
+        return StoredMessage(
+            message_id, guild_id, channel_id, author_id, content, utils.snowflake_time(message_id)
+        )
+
+
+def init_message_store(bot: Bot):
+    # This is called in the main bot file, the message logs read deleted and edited messages from bot.message_store.
+    bot.message_store = MessageStore()
+    bot.add_listener(bot.message_store.on_message)
@@ -0,0 +1,232 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from time import monotonic
+from discord.ext.commands import Bot
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lowest goes first.
+INTERACTIVE = 0  # Replies to a user waiting on the bot: commands, errors...
+NORMAL = 1
+BULK = 2  # Traffic nobody is waiting on: logs, announcements...
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+
+class SendDropped(Exception):
+    """
+    Raised for a send that was dropped because its queue was full.
+    """
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests every `per` seconds, refilled continuously.
+    """
+
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = monotonic()
+
+    def delay(self):
+        """
+        :return: float - seconds until a token is available, 0 if one is available now
+        """
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.fill_rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self):
+        self.delay()
+        return self.tokens >= self.capacity
+
+
+class Route:
+    """
+    The pending sends to one channel, one queue per priority class.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.merge_keys = {}
+        self.task = None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def is_idle(self):
+        """
+        A route is idle once it has nothing queued and its bucket has refilled,
+        forgetting it then loses nothing.
+        """
+        return self.task is None and not len(self) and self.bucket.is_full()
+
+    def next_queue(self):
+        for priority in PRIORITIES:
+            if self.queues[priority]:
+                return self.queues[priority]
+        return None
+
+
+class SendScheduler:
+    """
+    Every message the bot sends goes through here.
+
+    Sends are queued per channel, and released as the channel's token bucket allows
+    (SEND_ROUTE_RATE per SEND_ROUTE_PER seconds, and SEND_GLOBAL_RATE per second over every channel).
+    The buckets are a coarse outer limit, not Discord's: discord.py still honours the X-RateLimit-* headers
+    of every request. They only decide the order the sends reach discord.py in, so that
+    interactive replies always go first, and a burst of logs never delays a command's answer.
+
+    NORMAL and BULK queues hold at most SEND_QUEUE_SIZE sends per channel, the oldest is dropped beyond that.
+    A send with a merge key that is already queued is merged into the queued one instead of queued again.
+    """
+
+    def __init__(self, route_rate=None, route_per=None, global_rate=None, queue_size=None):
+        """
+        :param route_rate: Sends allowed per channel every route_per seconds
+        :param route_per: Seconds over which route_rate is counted
+        :param global_rate: Requests allowed per second over every channel
+        :param queue_size: NORMAL and BULK sends kept per channel
+        """
+        self.route_rate = route_rate or int(os.getenv("SEND_ROUTE_RATE", 5))
+        self.route_per = route_per or float(os.getenv("SEND_ROUTE_PER", 5))
+        self.queue_size = queue_size or int(os.getenv("SEND_QUEUE_SIZE", 100))
+        self.global_bucket = TokenBucket(global_rate or int(os.getenv("SEND_GLOBAL_RATE", 50)), 1)
+
+        self.routes = {}
+
+        self.sent = 0
+        self.dropped = 0
+        self.merged = 0
+        self.last_wait = {priority: 0.0 for priority in PRIORITIES}
+
+    async def send(self, destination, *args, priority=NORMAL, **kwargs):
+        """
+        Sends a message once the channel's bucket allows it.
+        Takes the same arguments as destination.send.
+
+        :param destination: discord.abc.Messageable or commands.Context
+        :param priority: INTERACTIVE, NORMAL or BULK
+        :return: discord.Message
+        """
+        channel = getattr(destination, "channel", destination)
+        return await self.submit(channel.id, partial(destination.send, *args, **kwargs), priority)
+
+    def submit(self, route_id, factory, priority=NORMAL, merge_key=None):
+        """
+        Queues a request on a route.
+
+        :param route_id: The ID of the channel the request goes to
+        :param factory: A coroutine function making the request once it is allowed
+        :param priority: INTERACTIVE, NORMAL or BULK
+        :param merge_key: Requests with the same key are only queued once
+        :return: asyncio.Future - the result of the request, SendDropped if it was dropped.
+            Merged requests are shielded: a caller cancelling its wait does not cancel the request of the others.
+        """
+        route = self.routes.get(route_id)
+        if route is None:
+            self._prune()
+            route = self.routes[route_id] = Route(TokenBucket(self.route_rate, self.route_per))
+
+        if merge_key is not None and merge_key in route.merge_keys:
+            self.merged += 1
+            return asyncio.shield(route.merge_keys[merge_key])
+
+        future = asyncio.get_running_loop().create_future()
+        queue = route.queues[priority]
+        if priority != INTERACTIVE and len(queue) >= self.queue_size:
+            self._drop(route, queue.popleft())
+        queue.append((monotonic(), priority, factory, future, merge_key))
+        if merge_key is not None:
+            route.merge_keys[merge_key] = future
+
+        if route.task is None:
+            route.task = asyncio.create_task(self._run(route))
+        return asyncio.shield(future) if merge_key is not None else future
+
+    def stats(self):
+        """
+        Returns the state of the scheduler.
+
+        :return: dict - queued sends per priority, counters, and the last queue wait per priority in ms
+        """
+        queued = {priority: 0 for priority in PRIORITIES}
+        for route in self.routes.values():
+            for priority, queue in route.queues.items():
+                queued[priority] += len(queue)
+        return {
+            "routes": len(self.routes),
+            "queued": queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "last_wait_ms": {priority: round(wait * 1000, 1) for priority, wait in self.last_wait.items()},
+        }
+
+    def _drop(self, route, item):
+        _, _, _, future, merge_key = item
+        route.merge_keys.pop(merge_key, None)
+        self.dropped += 1
+        if not future.done():
+            future.set_exception(SendDropped())
+        logger.debug("Dropped a queued send, its queue is full.")
+
+    async def _run(self, route):
+        """
+        Releases the requests of a route, highest priority first, as fast as the buckets allow.
+        """
+        try:
+            while True:
+                queue = route.next_queue()
+                if queue is None:
+                    return
+                if queue[0][3].cancelled():
+                    # Nobody is waiting for it anymore.
+                    route.merge_keys.pop(queue.popleft()[4], None)
+                    continue
+
+                delay = max(route.bucket.delay(), self.global_bucket.delay())
+                if delay:
+                    # Something more urgent may be queued while waiting, so the queue is picked again.
+                    await asyncio.sleep(delay)
+                    continue
+
+                route.bucket.take()
+                self.global_bucket.take()
+                queued_at, priority, factory, future, merge_key = queue.popleft()
+                route.merge_keys.pop(merge_key, None)
+                self.last_wait[priority] = monotonic() - queued_at
+
+                try:
+                    result = await factory()
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    self.sent += 1
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            route.task = None
+
+    def _prune(self):
+        """
+        Forgets the idle routes.
+        """
+        for route_id in [route_id for route_id, route in self.routes.items() if route.is_idle()]:
+            del self.routes[route_id]
+
+
+def init_scheduler(bot: Bot):
+    # This is called in the main bot file, every cog sends its messages through bot.scheduler.
+    bot.scheduler = SendScheduler()